@@ -0,0 +1,343 @@
+# # # #
+#  Benchmark suite: wall time and peak memory of importing, fitting, projection, streaming, aged DAU,
+#  combining and I/O on synthetic retention curves and cohorts at small / medium / large scales,
+#  compared against a stored baseline. exits with an error if any case is slower or uses more memory
+#  than its baseline by more than the tolerance
+#  run from the repository root with: python -m benchmarks.suite [--scales small medium] [--save]
+#
+#  the baseline (benchmarks/baseline.json) is specific to the machine it was recorded on, so after
+#  moving to a different machine record a new one with --save before comparing against it
+# # # #
+
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import contextlib
+import platform
+import tempfile
+import tracemalloc
+import warnings
+import subprocess
+import theseus_growth as tg
+from theseus_growth import projection_cache
+from theseus_growth import curve_functions
+from theseus_growth import retention_profile
+from theseus_growth import cohort_projections
+from benchmarks import synthetic
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+
+#  periods projected, cohorts acquired, profiles fitted and totals combined at each scale, and the
+#  number of cohorts dated by create_cohorts
+SCALES = {
+    'small': {'periods': 365, 'cohorts': 30, 'profiles': 10, 'totals': 3, 'dated_cohorts': 10000},
+    'medium': {'periods': 730, 'cohorts': 365, 'profiles': 50, 'totals': 10, 'dated_cohorts': 100000},
+    'large': {'periods': 1825, 'cohorts': 1000, 'profiles': 200, 'totals': 50, 'dated_cohorts': 1000000}
+}
+
+AGES = [1, 7, 30, 90, 180]
+
+#  differences smaller than these are noise, whatever the tolerance
+MIN_SECONDS = 0.005
+MIN_BYTES = 1024 * 1024
+
+
+# # # #
+#  Cases
+#  each case takes the scale and returns the function to be measured; everything the function
+#  needs is prepared up front so that only the call being benchmarked is measured
+# # # #
+
+def get_profile():
+    days, retention_values = synthetic.retention_curve(0)
+    return tg.theseus().create_profile(days, retention_values, profile_max=180)
+
+
+def import_package(scale):
+    # the cold start cost of importing theseus_growth in a fresh interpreter (the same at every scale).
+    # tests/test_import.py checks which modules it imports
+    return lambda: subprocess.run([sys.executable, '-c', 'import theseus_growth'], check=True, cwd=ROOT)
+
+
+def create_profile(scale):
+    th = tg.theseus()
+    curves = [synthetic.retention_curve(i) for i in range(scale['profiles'])]
+
+    def run():
+        for days, retention_values in curves:
+            th.create_profile(days, retention_values, profile_max=scale['periods'])
+    return run
+
+
+def create_profiles(scale):
+    # the same profiles as create_profile, fitted across a process pool
+    th = tg.theseus()
+    segments = synthetic.segments(scale['profiles'])
+    return lambda: th.create_profiles(segments, profile_max=scale['periods'], chunksize=8)
+
+
+def get_fitting_profiles(scale):
+    return [dict(zip(['x', 'y'], synthetic.retention_curve(i))) for i in range(scale['profiles'])]
+
+
+def fit_default_start(scale):
+    # every form fitted by curve_fit from its default starting point, to compare the initial guesses with
+    from scipy.optimize import curve_fit
+    profiles = get_fitting_profiles(scale)
+
+    def run():
+        for profile in profiles:
+            for process_value in curve_functions.processes:
+                try:
+                    curve_fit(curve_functions.get_form(process_value).function, profile['x'], profile['y'])
+                except Exception:
+                    pass
+    return run
+
+
+def fit_initial_guesses(scale):
+    # every form fitted from its analytic initial guess
+    profiles = get_fitting_profiles(scale)
+
+    def run():
+        for profile in profiles:
+            for process_value in curve_functions.processes:
+                retention_profile.generate_curve_coefficients(profile, process_value)
+    return run
+
+
+def fit_warm_start(scale):
+    # every form fitted from the params of a fitted profile of a slightly different curve, like
+    # yesterday's fit of a segment
+    profiles = get_fitting_profiles(scale)
+    warm_starts = [
+        {'params': retention_profile.process_retention_profile_projection(
+            dict(zip(['x', 'y'], synthetic.retention_curve(i + len(profiles))))
+        )} for i in range(len(profiles))
+    ]
+
+    def run():
+        for profile, warm_start in zip(profiles, warm_starts):
+            for process_value in curve_functions.processes:
+                retention_profile.generate_curve_coefficients(profile, process_value, warm_start=warm_start)
+    return run
+
+
+def create_cohorts(scale):
+    cohorts = synthetic.cohorts(scale['dated_cohorts'])
+    return lambda: cohort_projections.create_cohorts(cohorts, start_date=1)
+
+
+def project_cohorted_DAU(scale):
+    th = tg.theseus()
+    profile = get_profile()
+    cohorts = synthetic.cohorts(scale['cohorts'])
+    return lambda: th.project_cohorted_DAU(profile, scale['periods'], cohorts)
+
+
+def project_targeted_DAU(scale):
+    th = tg.theseus()
+    profile = get_profile()
+    # the new cohorts needed to reach a target well above the DAU the given cohorts settle at,
+    # acquired after them and before the target timeline
+    cohorts = synthetic.cohorts(min(scale['cohorts'], scale['periods'] // 4))
+    DAU_target = 3 * sum(cohorts) // len(cohorts) * 10
+    return lambda: th.project_cohorted_DAU(
+        profile, scale['periods'], cohorts, DAU_target=DAU_target, DAU_target_timeline=scale['periods'] // 2
+    )
+
+
+def DAU_total(scale):
+    th = tg.theseus()
+    forward_DAU = th.project_cohorted_DAU(get_profile(), scale['periods'], synthetic.cohorts(scale['cohorts']))
+    return lambda: th.DAU_total(forward_DAU)
+
+
+def stream_cohorted_DAU(scale):
+    # the totals and aged DAU of one cohort per day, a chunk at a time: its peak memory should stay
+    # flat as the number of periods grows, unlike project_cohorted_DAU followed by DAU_total
+    th = tg.theseus()
+    profile = get_profile()
+    cohorts = synthetic.cohorts(scale['periods'])
+
+    def run():
+        for chunk in th.stream_cohorted_DAU(profile, scale['periods'], cohorts, ages=AGES, chunk_size=90):
+            chunk['DAU']
+    return run
+
+
+def project_aged_DAU(scale):
+    th = tg.theseus()
+    profile = get_profile()
+    cohorts = synthetic.cohorts(scale['cohorts'])
+    return lambda: th.project_aged_DAU(profile, scale['periods'], cohorts, AGES)
+
+
+def combine_DAU(scale):
+    th = tg.theseus()
+    profile = get_profile()
+    totals = [
+        th.DAU_total(th.project_cohorted_DAU(profile, scale['periods'], synthetic.cohorts(scale['cohorts'], seed)))
+        for seed in range(scale['totals'])
+    ]
+    labels = ['segment_' + str(i) for i in range(scale['totals'])]
+    return lambda: th.combine_DAU(totals, labels)
+
+
+def to_json(scale):
+    th = tg.theseus()
+    forward_DAU = th.project_cohorted_DAU(get_profile(), scale['periods'], synthetic.cohorts(scale['cohorts']))
+    path = tempfile.mkdtemp()
+    return lambda: th.to_json(forward_DAU, os.path.join(path, 'forward_DAU')), path
+
+
+def parquet(scale):
+    # writing the forward DAU in the long layout and reading it back
+    th = tg.theseus()
+    forward_DAU = th.project_cohorted_DAU(get_profile(), scale['periods'], synthetic.cohorts(scale['cohorts']))
+    path = tempfile.mkdtemp()
+    file_name = os.path.join(path, 'forward_DAU')
+
+    def run():
+        th.to_parquet(forward_DAU, file_name, layout='long')
+        th.read_parquet(file_name)
+    return run, path
+
+
+CASES = {
+    'import': import_package,
+    'create_profile': create_profile,
+    'create_profiles': create_profiles,
+    'fit_default_start': fit_default_start,
+    'fit_initial_guesses': fit_initial_guesses,
+    'fit_warm_start': fit_warm_start,
+    'create_cohorts': create_cohorts,
+    'project_cohorted_DAU': project_cohorted_DAU,
+    'project_targeted_DAU': project_targeted_DAU,
+    'DAU_total': DAU_total,
+    'stream_cohorted_DAU': stream_cohorted_DAU,
+    'project_aged_DAU': project_aged_DAU,
+    'combine_DAU': combine_DAU,
+    'to_json': to_json,
+    'parquet': parquet
+}
+
+#  the optional packages a case needs: it's skipped if they aren't installed
+REQUIREMENTS = {
+    'parquet': 'pyarrow'
+}
+
+
+# # # #
+#  Measurement
+# # # #
+
+def measure(case, scale, repeats):
+    # the notices printed when a curve can't be fitted would drown out the results
+    with contextlib.redirect_stdout(io.StringIO()):
+        prepared = CASES[case](scale)
+        run, path = prepared if isinstance(prepared, tuple) else (prepared, None)
+        try:
+            timings = []
+            for _ in range(repeats):
+                # every run starts from an empty projection cache, so re-projecting the same profile isn't free
+                projection_cache.cache.clear()
+                start = time.perf_counter()
+                run()
+                timings.append(time.perf_counter() - start)
+
+            # the peak is measured in a separate run, since tracing allocations slows everything down
+            projection_cache.cache.clear()
+            tracemalloc.start()
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        finally:
+            if path is not None:
+                shutil.rmtree(path, ignore_errors=True)
+
+    return {'seconds': min(timings), 'peak_bytes': peak}
+
+
+def is_available(case):
+    if case not in REQUIREMENTS:
+        return True
+    try:
+        __import__(REQUIREMENTS[case])
+        return True
+    except ImportError:
+        return False
+
+
+def compare(result, baseline, time_tolerance, memory_tolerance):
+    # the reasons result is a regression from baseline, if it is one
+    regressions = []
+    if result['seconds'] > baseline['seconds'] * (1 + time_tolerance) + MIN_SECONDS:
+        regressions.append('{:.3f}s vs. {:.3f}s'.format(result['seconds'], baseline['seconds']))
+    if result['peak_bytes'] > baseline['peak_bytes'] * (1 + memory_tolerance) + MIN_BYTES:
+        regressions.append('{:.1f} MB vs. {:.1f} MB peak'.format(
+            result['peak_bytes'] / 2 ** 20, baseline['peak_bytes'] / 2 ** 20
+        ))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Theseus benchmark suite')
+    parser.add_argument('--scales', nargs='+', choices=list(SCALES), default=list(SCALES))
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES))
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save', action='store_true', help='record these results as the baseline')
+    parser.add_argument('--time-tolerance', type=float, default=0.5,
+                        help='the fraction slower than the baseline that counts as a regression')
+    parser.add_argument('--memory-tolerance', type=float, default=0.25,
+                        help='the fraction more memory than the baseline that counts as a regression')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+
+    baseline = {'results': {}}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {}
+    failures = []
+    for scale_name in args.scales:
+        for case in args.cases:
+            name = scale_name + '/' + case
+            if not is_available(case):
+                print('{:<30} skipped: requires {}'.format(name, REQUIREMENTS[case]))
+                continue
+
+            result = measure(case, SCALES[scale_name], args.repeats)
+            results[name] = result
+
+            status = ''
+            if not args.save and name in baseline['results']:
+                regressions = compare(result, baseline['results'][name], args.time_tolerance, args.memory_tolerance)
+                status = 'REGRESSION ' + ', '.join(regressions) if regressions else 'ok'
+                if regressions:
+                    failures.append(name)
+            print('{:<30} {:8.3f}s  peak {:8.1f} MB  {}'.format(
+                name, result['seconds'], result['peak_bytes'] / 2 ** 20, status
+            ))
+
+    if args.save:
+        baseline['machine'] = {'platform': platform.platform(), 'python': platform.python_version()}
+        baseline['results'].update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print('Saved the baseline to ' + args.baseline)
+
+    if failures:
+        sys.exit('Regressions in: ' + ', '.join(failures))
+
+
+if __name__ == '__main__':
+    main()
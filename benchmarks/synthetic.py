@@ -0,0 +1,31 @@
+# # # #
+#  Synthetic retention data used by the benchmarks
+# # # #
+
+import numpy as np
+
+DAYS = [1, 2, 3, 4, 5, 6, 7, 14, 21, 30, 45, 60, 90, 120, 150, 180]
+
+
+def retention_curve(seed, days=DAYS):
+    # a noisy power-law retention curve in whole-number percentages, like the data
+    # passed to create_profile: D1 retention somewhere between 30 and 60
+    rng = np.random.default_rng(seed)
+    d1 = rng.uniform(30, 60)
+    decay = rng.uniform(0.3, 0.7)
+    noise = rng.normal(1, 0.03, len(days))
+
+    retention = d1 * np.asarray(days, dtype=float) ** -decay * noise
+    retention = np.clip(retention, 0.1, 100)
+    return list(days), [float(round(y, 2)) for y in retention]
+
+
+def segments(count, days=DAYS):
+    # a mapping of segment name -> (days, retention_values) for create_profiles
+    return {'segment_' + str(i): retention_curve(i, days) for i in range(count)}
+
+
+def cohorts(count, seed=0):
+    # daily new user values
+    rng = np.random.default_rng(seed)
+    return [int(x) for x in rng.integers(500, 5000, count)]
@@ -0,0 +1,24 @@
+import warnings
+import pytest
+import pandas as pd
+import theseus_growth as tg
+
+DAYS = [1, 3, 7, 14, 30, 60, 90, 180]
+RETENTION_VALUES = [80, 70, 55, 50, 30, 22, 10, 8]
+
+
+@pytest.fixture(scope='session')
+def th():
+    return tg.theseus()
+
+
+@pytest.fixture(scope='session', params=['best_fit', 'interpolate', 'power'])
+def profile(request, th):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return th.create_profile(DAYS, RETENTION_VALUES, form=request.param, profile_max=365)
+
+
+def assert_same_frame(result, expected):
+    # the reference frames hold object columns of python ints, so only the values are compared
+    pd.testing.assert_frame_equal(result, expected.astype(result.dtypes.to_dict()), check_index_type=False)
@@ -0,0 +1,122 @@
+# # # #
+#  Reference implementations
+#  the original (row by row) projection functions, kept as they were before they were vectorized, so
+#  that the tests can check that the faster versions give the same results. the only change is that
+#  DataFrame.append, which newer versions of pandas don't have, is replaced with pd.concat
+# # # #
+
+import pandas as pd
+from scipy.stats import linregress
+
+
+def project_cohort(cohort, profile, periods):
+    this_cohort = [
+        int(cohort * profile['retention_projection'][1][i]/100)
+        if i <= max(profile['retention_projection'][0]) else 0 for i in range(0, periods)
+    ]
+
+    return this_cohort
+
+
+def build_forward_DAU(profile, forward_DAU, cohort, periods, start_date):
+    this_cohort = project_cohort(cohort, profile, periods)
+
+    delta_count = len(forward_DAU)
+    if start_date == 1:
+        this_cohort = [len(forward_DAU)] + ([0] * (delta_count)) + this_cohort
+    else:
+        this_cohort = [len(forward_DAU)] + ([0] * (delta_count + 1)) + this_cohort
+    if delta_count > 0:
+        del this_cohort[-delta_count:]
+
+    forward_DAU.loc[len(forward_DAU)] = this_cohort
+    forward_DAU = forward_DAU.fillna(0)
+
+    return forward_DAU
+
+
+def build_DAU_trajectory(start_DAU, end_DAU, periods):
+    x = [1, periods]
+    y = [start_DAU, end_DAU]
+
+    model = linregress(x, y)
+
+    return model
+
+
+def project_targeted_DAU(profile, forward_DAU, periods, cohorts, DAU_target, DAU_target_timeline, start_date):
+    tracker = len(cohorts) + 1
+
+    start_DAU = forward_DAU.iloc[:, tracker - 1].sum()
+    model = build_DAU_trajectory(start_DAU, DAU_target, (DAU_target_timeline + 1 - len(cohorts)))
+    DAU_values = [int(model[0] * i + model[1]) for i in range(1, (DAU_target_timeline + 2 - len(cohorts)))][1:]
+
+    for DAU_target in DAU_values:
+
+        if len(forward_DAU) > len(forward_DAU.columns.tolist()):
+            forward_DAU[str(int(forward_DAU.columns.tolist()[-1]) + 1)] = [0] * (len(forward_DAU))
+
+        start_DAU = forward_DAU.iloc[:, tracker].sum()
+        DAU_needed = (0 if DAU_target - start_DAU < 0 else DAU_target - start_DAU)
+
+        forward_DAU = build_forward_DAU(profile, forward_DAU, DAU_needed, periods, start_date)
+
+        tracker += 1
+
+    return forward_DAU
+
+
+def project_cohorted_DAU(profile, periods, cohorts, DAU_target=None, DAU_target_timeline=None, start_date=1):
+    if start_date == 0 or start_date is None:
+        start_date = 1
+
+    if start_date == 1:
+        dates = list(range(start_date, (start_date + periods)))
+    else:
+        dates = list(range(start_date, (start_date + periods + 1)))
+
+    dates = [str(x) for x in dates]
+
+    forward_DAU = pd.DataFrame(columns=['cohort_date'] + dates)
+    for cohort in cohorts:
+        forward_DAU = build_forward_DAU(profile, forward_DAU, cohort, periods, start_date)
+
+    if DAU_target is not None:
+        forward_DAU = project_targeted_DAU(
+            profile, forward_DAU, periods, cohorts, DAU_target, DAU_target_timeline, start_date
+        )
+
+    forward_DAU['cohort_date'] = forward_DAU['cohort_date'] + 1
+
+    return forward_DAU.set_index('cohort_date')
+
+
+def project_aged_DAU(profile, periods, cohorts, ages, start_date=1, exact=False):
+    # project_aged_DAU, or project_exact_aged_DAU with exact=True
+    if start_date == 0:
+        start_date = 1
+    dates = list(range(start_date, (start_date + periods)))
+    dates = [str(x) for x in dates]
+    aged_DAU = pd.DataFrame(columns=['age'] + dates).set_index('age')
+    ages = [age for age in ages if age <= periods]
+    for i, age in enumerate(ages):
+        this_age = pd.DataFrame(columns=['age'] + dates).set_index('age')
+        this_age.loc[age] = [0] * len(dates)
+        aged_DAU = pd.concat([aged_DAU, this_age])
+
+    for i, cohort in enumerate(cohorts):
+        this_cohort = project_cohort(cohort, profile, periods)
+        for j, age in enumerate(ages):
+            temp_cohort = this_cohort.copy()
+            this_age = aged_DAU.loc[[age]]
+            if age > 0:
+                temp_cohort[0: (age - 1)] = [0] * (age - 1)
+                if exact:
+                    temp_cohort[age:] = [0] * (len(temp_cohort) - age)
+            if i > 0:
+                temp_cohort = [0] * i + temp_cohort[: -i]
+            cohort_age = pd.DataFrame(columns=['age'] + dates).set_index('age')
+            cohort_age.loc[age] = temp_cohort
+            aged_DAU.loc[[age]] = this_age.add(cohort_age, fill_value=0)
+
+    return aged_DAU
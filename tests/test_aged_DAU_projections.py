@@ -0,0 +1,26 @@
+import pytest
+from tests import reference
+from tests.conftest import assert_same_frame
+
+#  the reference's row by row frame building hits deprecations inside some versions of pandas
+pytestmark = pytest.mark.filterwarnings('ignore::DeprecationWarning')
+
+CASES = [
+    (20, [100, 200, 300, 400, 500], [3, 7, 14], 1),
+    (60, list(range(1000, 2000, 50)), [1, 7, 30], 1),
+    (60, list(range(1000, 2000, 50)), [7, 30, 90], 5),
+]
+
+
+@pytest.mark.parametrize('periods, cohorts, ages, start_date', CASES)
+def test_aged_DAU_matches_reference(th, profile, periods, cohorts, ages, start_date):
+    result = th.project_aged_DAU(profile, periods, cohorts, ages, start_date)
+    expected = reference.project_aged_DAU(profile, periods, cohorts, ages, start_date)
+    assert_same_frame(result, expected)
+
+
+@pytest.mark.parametrize('periods, cohorts, ages, start_date', CASES)
+def test_exact_aged_DAU_matches_reference(th, profile, periods, cohorts, ages, start_date):
+    result = th.project_exact_aged_DAU(profile, periods, cohorts, ages, start_date)
+    expected = reference.project_aged_DAU(profile, periods, cohorts, ages, start_date, exact=True)
+    assert_same_frame(result, expected)
@@ -0,0 +1,115 @@
+import pytest
+import numpy as np
+import pandas as pd
+from theseus_growth.banded_DAU import BandedForwardDAU
+from tests import reference
+from tests.conftest import assert_same_frame
+
+
+def dense(forward_DAU):
+    return forward_DAU.to_dataframe() if isinstance(forward_DAU, BandedForwardDAU) else forward_DAU
+
+
+@pytest.mark.parametrize('periods, cohorts, start_date', [
+    (30, [1000], 1),
+    (60, [1000, 1500, 800, 2000, 1200], 1),
+    (60, [1000, 1500, 800, 2000, 1200], 5),
+    (365, list(range(500, 5500, 50)), 1),
+])
+@pytest.mark.parametrize('storage', ['dense', 'banded'])
+def test_forward_DAU_matches_reference(th, profile, periods, cohorts, start_date, storage):
+    result = dense(th.project_cohorted_DAU(profile, periods, cohorts, start_date=start_date, storage=storage))
+    expected = reference.project_cohorted_DAU(profile, periods, cohorts, start_date=start_date)
+    assert_same_frame(result, expected)
+
+
+@pytest.mark.parametrize('periods, cohorts, DAU_target, DAU_target_timeline', [
+    (60, [1000, 1500, 800], 5000, 30),
+    (90, [1000, 1500, 800, 2000, 1200], 3000, 60),
+    (120, [2000] * 10, 500, 40),
+])
+@pytest.mark.parametrize('storage', ['dense', 'banded'])
+def test_targeted_DAU_matches_reference(th, profile, periods, cohorts, DAU_target, DAU_target_timeline, storage):
+    result = dense(
+        th.project_cohorted_DAU(profile, periods, cohorts, DAU_target, DAU_target_timeline, storage=storage)
+    )
+    expected = reference.project_cohorted_DAU(profile, periods, cohorts, DAU_target, DAU_target_timeline)
+    assert_same_frame(result, expected)
+
+
+def test_targeted_DNU_matches_reference_cohorts(th, profile):
+    cohorts = [1000, 1500, 800, 2000, 1200]
+    expected = reference.project_cohorted_DAU(profile, 90, cohorts, 3000, 60)
+    DNU = th.project_targeted_DNU(profile, 90, cohorts, 3000, 60)
+    # each cohort of the reference starts one day after the last, so its DNU is on the diagonal
+    assert list(DNU) == [expected.iloc[i, i] for i in range(len(expected))]
+
+
+@pytest.mark.parametrize('periods, cohorts, DAU_target, DAU_target_timeline, start_date', [
+    (60, [1000, 1500, 800, 2000, 1200], None, None, 1),
+    (60, [1000, 1500, 800, 2000, 1200], None, None, 5),
+    (90, [1000, 1500, 800], 3000, 60, 1),
+    (400, list(range(500, 5500, 50)), None, None, 1),
+])
+#  the dense get_DNU hits deprecations inside some versions of pandas
+@pytest.mark.filterwarnings('ignore::DeprecationWarning')
+def test_banded_DNU_and_DAU_total_match_dense(th, profile, periods, cohorts, DAU_target, DAU_target_timeline,
+                                              start_date):
+    dense_DAU = th.project_cohorted_DAU(profile, periods, cohorts, DAU_target, DAU_target_timeline, start_date)
+    banded_DAU = th.project_cohorted_DAU(
+        profile, periods, cohorts, DAU_target, DAU_target_timeline, start_date, storage='banded'
+    )
+    assert isinstance(banded_DAU, BandedForwardDAU)
+    pd.testing.assert_frame_equal(th.DAU_total(banded_DAU), th.DAU_total(dense_DAU), check_dtype=False)
+    pd.testing.assert_frame_equal(th.get_DNU(banded_DAU), th.get_DNU(dense_DAU), check_dtype=False)
+
+
+SCENARIOS = [
+    [1000, 1500, 800, 2000, 1200],
+    [2000, 1500, 1000, 500, 1],
+    [50] * 5,
+]
+
+
+@pytest.mark.parametrize('periods, start_date', [(60, 1), (60, 5), (365, 1)])
+def test_exact_scenarios_match_DAU_total(th, profile, periods, start_date):
+    result = th.project_scenarios(profile, periods, SCENARIOS, start_date, method='exact')
+    for scenario, DAU in zip(SCENARIOS, result):
+        expected = th.DAU_total(th.project_cohorted_DAU(profile, periods, scenario, start_date=start_date))
+        assert list(DAU) == list(expected.iloc[0])
+
+
+@pytest.mark.parametrize('start_date', [1, 5])
+def test_float_scenarios_are_within_a_user_per_cohort(th, profile, start_date):
+    periods = 200
+    plans = [list(range(1000, 5000, 20)), [3000] * 150 + [0] * 50]
+    exact = th.project_scenarios(profile, periods, plans, start_date, method='exact')
+    matmul = th.project_scenarios(profile, periods, plans, start_date, method='matmul')
+    fft = th.project_scenarios(profile, periods, plans, start_date, method='fft')
+
+    np.testing.assert_allclose(fft, matmul, rtol=1e-9, atol=1e-6)
+    # each cohort active on a date is rounded down by less than 1 user
+    offset = 0 if start_date == 1 else 1
+    for plan, exact_DAU, matmul_DAU in zip(plans, exact, matmul):
+        active = np.cumsum(np.asarray(plan) > 0)
+        active = np.concatenate([[0] * offset, active])
+        difference = matmul_DAU - exact_DAU
+        assert np.all(difference > -1e-6)
+        assert np.all(difference < active + 1e-6)
+
+
+@pytest.mark.parametrize('periods, cohorts, DAU_target, DAU_target_timeline', [
+    (1, [1000], 3000, 1),
+    (90.0, [1000], 3000, 60),
+    (90, [], 3000, 60),
+    (90, [1000, 0], 3000, 60),
+    (90, [1000, 1500.5], 3000, 60),
+    (90, [1000], None, 60),
+    (90, [1000], 3000, None),
+    (90, [1000], 3000, 120),
+    (90, [1000] * 40, 3000, 60),
+])
+def test_targeted_DNU_rejects_bad_parameters(th, profile, periods, cohorts, DAU_target, DAU_target_timeline):
+    with pytest.raises(Exception) as error:
+        th.project_targeted_DNU(profile, periods, cohorts, DAU_target, DAU_target_timeline)
+    assert type(error.value) is Exception
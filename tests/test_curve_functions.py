@@ -0,0 +1,72 @@
+import pytest
+import numpy as np
+from theseus_growth import curve_functions
+from theseus_growth.retention_profile import RetentionProfile
+
+
+def test_interpolation_averages_repeated_days():
+    profile = RetentionProfile([1, 1, 3, 7, 7, 7], [80, 70, 50, 40, 30, 20])
+    values = curve_functions.get_interpolation_values(profile)
+    assert values == {'x': [1, 3, 7], 'y': [75.0, 50.0, 30.0]}
+    assert profile['x_collapsed'] == [1, 3, 7]
+    assert profile['y_collapsed'] == [75.0, 50.0, 30.0]
+
+
+def test_interpolation_weights_repeated_days():
+    profile = RetentionProfile([1, 1, 3, 7, 7], [80, 70, 50, 40, 20])
+    profile['weights'] = [300, 100, 50, 1, 3]
+    values = curve_functions.get_interpolation_values(profile)
+    # (80 * 300 + 70 * 100) / 400 and (40 * 1 + 20 * 3) / 4
+    assert values == {'x': [1, 3, 7], 'y': [77.5, 50.0, 25.0]}
+
+
+def test_interpolation_is_unchanged_by_equal_weights():
+    profile = RetentionProfile([1, 1, 3, 7, 7, 7], [80, 70, 50, 40, 30, 20])
+    weighted = RetentionProfile([1, 1, 3, 7, 7, 7], [80, 70, 50, 40, 30, 20])
+    weighted['weights'] = [5] * 6
+    assert curve_functions.get_interpolation_values(weighted) == curve_functions.get_interpolation_values(profile)
+
+
+def hyperbolic_func(x, a, b):
+    return a / (1 + b * x)
+
+
+def hyperbolic_guess(x, y):
+    return [y.max() * 1.1, 0.1]
+
+
+def test_registered_form_is_fit_and_scored(th):
+    days = [1, 3, 7, 14, 30, 60, 90]
+    retention_values = [float(v) for v in hyperbolic_func(np.asarray(days, dtype=float), 60, 0.2)]
+
+    th.register_curve_form('hyperbolic', hyperbolic_func, hyperbolic_guess)
+    try:
+        profile = th.create_profile(days, retention_values, profile_max=180)
+        assert 'hyperbolic' in profile['params'] and 'hyperbolic' in profile['errors']
+        assert profile['best_fit'] == 'hyperbolic'
+        np.testing.assert_allclose(profile['params']['hyperbolic'], [60, 0.2], rtol=1e-4)
+
+        chosen = th.create_profile(days, retention_values, form='hyperbolic', profile_max=180)
+        # the projection starts from 100% retention on the day users are acquired
+        projection = chosen['retention_projection'][1]
+        np.testing.assert_allclose(projection[1:91], hyperbolic_func(np.arange(1, 91), 60, 0.2), rtol=1e-4)
+    finally:
+        th.unregister_curve_form('hyperbolic')
+
+    refit = th.create_profile(days, retention_values, profile_max=180)
+    assert 'hyperbolic' not in refit['params'] and 'hyperbolic' not in refit['errors']
+    assert refit['best_fit'] != 'hyperbolic'
+    with pytest.raises(Exception):
+        th.create_profile(days, retention_values, form='hyperbolic', profile_max=180)
+    # a profile fit to a form that's since been unregistered can't be projected again
+    with pytest.raises(Exception, match='hyperbolic is not a valid retention curve function'):
+        profile.evaluate([1, 2, 3])
+
+
+def test_unknown_forms_are_rejected(th):
+    with pytest.raises(Exception, match='not a valid retention curve function'):
+        curve_functions.get_form('hyperbolic')
+    with pytest.raises(Exception):
+        th.unregister_curve_form('hyperbolic')
+    with pytest.raises(Exception):
+        th.register_curve_form('best_fit', hyperbolic_func)
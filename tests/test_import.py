@@ -0,0 +1,34 @@
+import os
+import sys
+import json
+import subprocess
+
+HEAVY_MODULES = ['matplotlib', 'pandas', 'scipy']
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def imported_modules(code):
+    # the heavy modules imported by running code in a fresh interpreter
+    script = code + '\nimport sys, json\nprint(json.dumps([m for m in {!r} if m in sys.modules]))'.format(HEAVY_MODULES)
+    output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True, cwd=ROOT)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def test_import_does_not_load_heavy_modules():
+    assert imported_modules('import theseus_growth') == []
+
+
+def test_creating_the_facade_does_not_load_heavy_modules():
+    assert imported_modules('import theseus_growth as tg\ntg.theseus()') == []
+
+
+def test_projection_does_not_load_matplotlib():
+    modules = imported_modules(
+        'import warnings\n'
+        'warnings.filterwarnings("ignore")\n'
+        'import theseus_growth as tg\n'
+        'th = tg.theseus()\n'
+        'profile = th.create_profile([1, 3, 7, 14, 30], [50, 35, 25, 18, 10], profile_max=180)\n'
+        'th.DAU_total(th.project_cohorted_DAU(profile, 60, [1000] * 10))'
+    )
+    assert 'matplotlib' not in modules
@@ -0,0 +1,46 @@
+import warnings
+import numpy as np
+from theseus_growth import instrumentation
+from theseus_growth.retention_profile import RetentionProfile
+from tests.conftest import DAYS, RETENTION_VALUES
+
+
+def create_profile(th, **kwargs):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return th.create_profile(DAYS, RETENTION_VALUES, profile_max=365, **kwargs)
+
+
+def test_sizes_of_mappings_and_profiles():
+    assert instrumentation.get_size({'log': np.float64(1.5), 'power': 2.0}) == 2
+    assert instrumentation.get_size({'params': {'log': np.zeros(2)}, 'best_fit': 'log'}) == 2
+    assert instrumentation.get_size({'best_fit': 'log'}) is None
+    assert instrumentation.get_size([1, 2, 3]) == 3
+    profile = RetentionProfile([1, 3, 7], [80, 50, 30], retention_projection=([1, 2], [80.0, 65.0]))
+    assert instrumentation.get_size(profile) == 8
+
+
+def test_profile_stages_are_sized(th):
+    with th.instrument() as timings:
+        create_profile(th)
+    stages = timings.to_dict()
+    assert stages['create_profile']['size'] > 365
+    assert stages['best_fit_scoring']['size'] > 0
+
+
+def test_allocations_are_recorded_for_stages_in_one_thread(th):
+    with th.instrument(trace_allocations=True) as timings:
+        create_profile(th)
+    assert all('allocated_bytes' in event for event in timings.events)
+    assert timings.to_dict()['create_profile']['allocated_bytes'] is not None
+
+
+def test_allocations_are_not_recorded_for_overlapping_threads(th):
+    with th.instrument(trace_allocations=True) as timings:
+        create_profile(th, parallel='thread')
+    for event in timings.events:
+        if event['thread'] != timings.events[-1]['thread'] or event['name'] == 'create_profile':
+            assert 'allocated_bytes' not in event
+    stages = timings.to_dict()
+    assert stages['create_profile']['allocated_bytes'] is None
+    assert stages['best_fit_scoring']['allocated_bytes'] is not None
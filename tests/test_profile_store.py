@@ -0,0 +1,81 @@
+import os
+import pytest
+import numpy as np
+from collections.abc import MutableMapping
+from theseus_growth import profile_store
+
+SEGMENTS = ['US_facebook', 'DE/google ads', 'JP?tiktok&50%']
+
+
+def open_store(tmp_path, backend):
+    path = str(tmp_path / ('profiles.db' if backend == 'sqlite' else 'profiles'))
+    return profile_store.open_profile_store(path, backend), path
+
+
+def assert_same_profile(result, expected):
+    assert list(result['x']) == list(expected['x'])
+    assert list(result['y']) == list(expected['y'])
+    assert result['best_fit'] == expected['best_fit']
+    np.testing.assert_array_equal(result['retention_projection'][1], expected['retention_projection'][1])
+    for form, params in expected['params'].items():
+        np.testing.assert_array_equal(result['params'][form], params)
+
+
+def test_save_and_load_profile(th, profile, tmp_path):
+    file_name = str(tmp_path / 'profile')
+    th.save_profile(profile, file_name)
+    assert os.path.exists(file_name + '.npz')
+    assert_same_profile(th.load_profile(file_name), profile)
+
+
+@pytest.mark.parametrize('backend', ['directory', 'sqlite'])
+def test_store_round_trip(profile, tmp_path, backend):
+    store, path = open_store(tmp_path, backend)
+    assert isinstance(store, MutableMapping)
+    for segment in SEGMENTS:
+        store[segment] = profile
+
+    assert len(store) == len(SEGMENTS)
+    assert SEGMENTS[1] in store
+    assert 'CA_facebook' not in store
+    assert_same_profile(store[SEGMENTS[1]], profile)
+    with pytest.raises(KeyError):
+        store['CA_facebook']
+    store.close()
+
+
+@pytest.mark.parametrize('backend', ['directory', 'sqlite'])
+def test_store_iteration(profile, tmp_path, backend):
+    store, path = open_store(tmp_path, backend)
+    for segment in SEGMENTS:
+        store[segment] = profile
+
+    assert list(store) == sorted(SEGMENTS)
+    assert [segment for segment, _ in store.items()] == sorted(SEGMENTS)
+    assert len(list(store.values())) == len(SEGMENTS)
+    assert store.get('CA_facebook') is None
+    assert_same_profile(store.get(SEGMENTS[0]), profile)
+    store.close()
+
+
+@pytest.mark.parametrize('backend', ['directory', 'sqlite'])
+def test_store_delete_and_reopen(profile, tmp_path, backend):
+    store, path = open_store(tmp_path, backend)
+    for segment in SEGMENTS:
+        store[segment] = profile
+    del store[SEGMENTS[0]]
+    with pytest.raises(KeyError):
+        del store[SEGMENTS[0]]
+    store.close()
+
+    store = profile_store.open_profile_store(path, backend)
+    assert list(store) == sorted(SEGMENTS[1:])
+    assert_same_profile(store[SEGMENTS[2]], profile)
+    store.clear()
+    assert len(store) == 0
+    store.close()
+
+
+def test_unknown_backend(tmp_path):
+    with pytest.raises(Exception):
+        profile_store.open_profile_store(str(tmp_path), 'redis')
@@ -0,0 +1,71 @@
+import warnings
+import pytest
+import numpy as np
+from theseus_growth import projection_cache
+from theseus_growth.projection_cache import ProjectionCache, profile_fingerprint
+from tests.conftest import DAYS, RETENTION_VALUES
+
+
+@pytest.fixture
+def empty_cache():
+    projection_cache.cache.clear()
+    yield projection_cache.cache
+    projection_cache.cache.clear()
+
+
+@pytest.mark.parametrize('form', ['interpolate', 'power'])
+def test_default_profile_max_is_the_last_day(th, form):
+    profile = th.create_profile(DAYS, RETENTION_VALUES, form=form)
+    assert profile_fingerprint(profile, None) == profile_fingerprint(profile, max(DAYS))
+    assert profile_fingerprint(profile, None) != profile_fingerprint(profile, 365)
+
+
+def test_fingerprint_changes_with_the_fit(th):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        power = th.create_profile(DAYS, RETENTION_VALUES, form='power', profile_max=365)
+        log = th.create_profile(DAYS, RETENTION_VALUES, form='log', profile_max=365)
+        shifted = th.create_profile(DAYS, [v + 1 for v in RETENTION_VALUES], form='power', profile_max=365)
+    assert profile_fingerprint(power, 365) != profile_fingerprint(log, 365)
+    assert profile_fingerprint(power, 365) != profile_fingerprint(shifted, 365)
+
+
+def test_weights_change_the_interpolation_fingerprint(th):
+    profile = th.create_profile(DAYS, RETENTION_VALUES, form='interpolate')
+    weighted = th.create_profile(DAYS, RETENTION_VALUES, form='interpolate', weights=[2] * len(DAYS))
+    assert profile_fingerprint(profile, None) != profile_fingerprint(weighted, None)
+
+
+def test_projections_without_a_profile_max_are_not_mixed_up(th, empty_cache):
+    # profiles over different ranges of days mustn't share a projection without a profile_max
+    short = th.create_profile(DAYS[:4], RETENTION_VALUES[:4], form='interpolate')
+    long = th.create_profile(DAYS[:5], RETENTION_VALUES[:5], form='interpolate')
+    assert len(short['retention_projection'][1]) != len(long['retention_projection'][1])
+
+
+def test_repeated_projections_come_from_the_cache(th, empty_cache):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        first = th.create_profile(DAYS, RETENTION_VALUES, form='power', profile_max=365)
+        hits = th.projection_cache_info()['hits']
+        second = th.create_profile(DAYS, RETENTION_VALUES, form='power', profile_max=365)
+    assert th.projection_cache_info()['hits'] == hits + 1
+    assert second['retention_projection'][1] is first['retention_projection'][1]
+
+
+def test_cache_evicts_the_least_recently_used():
+    cache = ProjectionCache(max_bytes=3 * 8 * 100)
+    for key in ['a', 'b', 'c']:
+        cache.put(key, np.zeros(100))
+    cache.get('a')
+    cache.put('d', np.zeros(100))
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('d') is not None
+    assert cache.info()['nbytes'] == 3 * 8 * 100
+
+    cache.set_max_bytes(0)
+    assert cache.info()['projections'] == 0
+    cache.put('e', np.zeros(100))
+    assert cache.get('e') is None
+    with pytest.raises(Exception):
+        cache.set_max_bytes(-1)
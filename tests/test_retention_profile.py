@@ -0,0 +1,197 @@
+import pickle
+import warnings
+import pytest
+import numpy as np
+import scipy.optimize
+from collections.abc import Mapping
+from theseus_growth import retention_profile
+from theseus_growth import projection_cache
+from theseus_growth.retention_profile import RetentionProfile
+from tests.conftest import DAYS, RETENTION_VALUES
+
+
+def create_profile(th, *args, **kwargs):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return th.create_profile(*args, **kwargs)
+
+
+def test_weights_reach_curve_fit(th, monkeypatch):
+    sigmas = []
+    curve_fit = scipy.optimize.curve_fit
+
+    def recording_curve_fit(*args, **kwargs):
+        sigmas.append(kwargs.get('sigma'))
+        return curve_fit(*args, **kwargs)
+
+    monkeypatch.setattr(scipy.optimize, 'curve_fit', recording_curve_fit)
+    weights = [4, 4, 1, 1, 16, 16, 25, 25]
+    create_profile(th, DAYS, RETENTION_VALUES, form='power', profile_max=365, weights=weights)
+    assert len(sigmas) > 0
+    for sigma in sigmas:
+        np.testing.assert_allclose(sigma, [0.5, 0.5, 1, 1, 0.25, 0.25, 0.2, 0.2])
+
+
+def test_unweighted_fit_has_no_sigma(th, monkeypatch):
+    sigmas = []
+    curve_fit = scipy.optimize.curve_fit
+
+    def recording_curve_fit(*args, **kwargs):
+        sigmas.append(kwargs.get('sigma'))
+        return curve_fit(*args, **kwargs)
+
+    monkeypatch.setattr(scipy.optimize, 'curve_fit', recording_curve_fit)
+    create_profile(th, DAYS, RETENTION_VALUES, form='power', profile_max=365)
+    assert sigmas == [None] * len(sigmas) and len(sigmas) > 0
+
+
+def test_weights_change_the_fit(th):
+    unweighted = create_profile(th, DAYS, RETENTION_VALUES, form='power', profile_max=365)
+    weighted = create_profile(th, DAYS, RETENTION_VALUES, form='power', profile_max=365,
+                              weights=[1000, 1000, 1000, 1000, 1, 1, 1, 1])
+    assert not np.allclose(unweighted['params']['power'], weighted['params']['power'])
+
+
+@pytest.mark.parametrize('weights', [
+    [1, 2, 3],
+    [1, 2, 3, 4, 5, 6, 7, 8, 9],
+    [1, 2, 3, 4, 5, 6, 7, 0],
+    [1, 2, 3, 4, 5, 6, 7, -1],
+    [1, 2, 3, 4, 5, 6, 7, float('nan')],
+    [1, 2, 3, 4, 5, 6, 7, float('inf')],
+])
+def test_bad_weights_are_rejected(th, weights):
+    with pytest.raises(Exception):
+        retention_profile.test_weights(DAYS, weights)
+    with pytest.raises(Exception):
+        th.create_profile(DAYS, RETENTION_VALUES, form='power', weights=weights)
+
+
+def test_good_weights_are_accepted():
+    assert retention_profile.test_weights(DAYS, [1, 2, 3, 4, 5, 6, 7, 8.5])
+
+
+NEW_DAYS = [120, 240, 300]
+NEW_VALUES = [9, 6, 5]
+
+
+def test_updated_interpolation_equals_a_full_refit(th):
+    profile = create_profile(th, DAYS, RETENTION_VALUES, form='interpolate', profile_max=365)
+    original = profile['retention_projection'][1].copy()
+
+    projection_cache.cache.clear()
+    updated = th.update_profile(profile, NEW_DAYS, NEW_VALUES)
+    projection_cache.cache.clear()
+    refit = create_profile(th, DAYS + NEW_DAYS, RETENTION_VALUES + NEW_VALUES, form='interpolate', profile_max=365)
+
+    assert updated['retention_profile'] == 'interpolate'
+    np.testing.assert_array_equal(updated['retention_projection'][1], refit['retention_projection'][1])
+    # the projection up to the last data point before the new ones is unchanged
+    np.testing.assert_array_equal(updated['retention_projection'][1][:91], original[:91])
+    # the profile passed in isn't changed
+    assert list(profile['x']) == DAYS
+    np.testing.assert_array_equal(profile['retention_projection'][1], original)
+
+
+@pytest.mark.parametrize('form', ['best_fit', 'power', 'log'])
+def test_updated_fit_equals_a_full_refit(th, form):
+    profile = create_profile(th, DAYS, RETENTION_VALUES, form=form, profile_max=365)
+    updated = th.update_profile(profile, NEW_DAYS, NEW_VALUES)
+    refit = create_profile(th, DAYS + NEW_DAYS, RETENTION_VALUES + NEW_VALUES, form=form, profile_max=365)
+
+    assert updated['retention_profile'] == form
+    assert updated['best_fit'] == refit['best_fit']
+    best_fit = refit['best_fit']
+    np.testing.assert_allclose(updated['params'][best_fit], refit['params'][best_fit], rtol=1e-4)
+    np.testing.assert_allclose(
+        updated['retention_projection'][1], refit['retention_projection'][1], rtol=1e-4, atol=1e-3
+    )
+
+
+def test_update_keeps_weights(th):
+    weights = [100] * len(DAYS)
+    profile = create_profile(th, DAYS, RETENTION_VALUES, form='power', profile_max=365, weights=weights)
+    with pytest.raises(Exception):
+        th.update_profile(profile, NEW_DAYS, NEW_VALUES)
+    updated = th.update_profile(profile, NEW_DAYS, NEW_VALUES, new_weights=[10, 10, 10])
+    assert list(updated['weights']) == weights + [10, 10, 10]
+
+    unweighted = create_profile(th, DAYS, RETENTION_VALUES, form='power', profile_max=365)
+    with pytest.raises(Exception):
+        th.update_profile(unweighted, NEW_DAYS, NEW_VALUES, new_weights=[10, 10, 10])
+
+
+@pytest.mark.parametrize('parallel', [None, 'thread'])
+def test_timed_out_fits_fall_back_to_the_interpolation(th, capsys, parallel):
+    profile = create_profile(th, DAYS, RETENTION_VALUES, profile_max=365, parallel=parallel, timeout=0)
+    interpolated = create_profile(th, DAYS, RETENTION_VALUES, form='interpolate', profile_max=365)
+
+    assert profile['params'] == {} and profile['errors'] == {}
+    assert profile['best_fit'] == 'interpolate'
+    np.testing.assert_array_equal(profile['retention_projection'][1], interpolated['retention_projection'][1])
+    assert 'the best fit is the interpolation' in capsys.readouterr().out
+
+
+def test_maxfev_leaves_out_forms_that_need_more_evaluations(th):
+    unlimited = create_profile(th, DAYS, RETENTION_VALUES, profile_max=365)
+    limited = create_profile(th, DAYS, RETENTION_VALUES, profile_max=365, maxfev=1)
+    assert set(limited['params']) < set(unlimited['params'])
+    assert limited['best_fit'] in list(limited['params']) + ['interpolate']
+
+
+def test_no_notice_when_the_interpolation_is_chosen(th, capsys):
+    profile = create_profile(th, DAYS, RETENTION_VALUES, form='interpolate', profile_max=365, timeout=0)
+    assert profile['best_fit'] == 'interpolate'
+    assert 'the best fit is the interpolation' not in capsys.readouterr().out
+
+
+@pytest.mark.parametrize('parallel', [None, 'thread', 'process'])
+def test_generous_limits_fit_like_no_limits(th, parallel):
+    unlimited = create_profile(th, DAYS, RETENTION_VALUES, profile_max=365)
+    limited = create_profile(th, DAYS, RETENTION_VALUES, profile_max=365, parallel=parallel, timeout=60, maxfev=10000)
+    assert limited['best_fit'] == unlimited['best_fit']
+    assert sorted(limited['params']) == sorted(unlimited['params'])
+    for form, params in unlimited['params'].items():
+        np.testing.assert_allclose(limited['params'][form], params, rtol=1e-6)
+
+
+def test_profile_is_a_mapping(th, profile):
+    assert isinstance(profile, Mapping) and not isinstance(profile, dict)
+    keys = list(profile)
+    assert keys[:2] == ['x', 'y'] and 'retention_projection' in keys
+    assert len(profile) == len(keys)
+    assert profile.get('segment') is None
+    assert dict(profile.items()).keys() == set(keys)
+
+
+def test_extra_keys_round_trip():
+    profile = RetentionProfile(DAYS, RETENTION_VALUES)
+    profile['segment'] = 'US_facebook'
+    profile['fitted_on'] = {'date': '2020-01-01'}
+
+    assert profile['segment'] == 'US_facebook'
+    assert 'segment' in profile
+    assert list(profile)[-2:] == ['segment', 'fitted_on']
+    assert len(profile) == 4
+
+    profile['segment'] = 'DE_google'
+    assert profile['segment'] == 'DE_google'
+    del profile['segment']
+    assert 'segment' not in profile
+    with pytest.raises(KeyError):
+        profile['segment']
+    with pytest.raises(KeyError):
+        del profile['segment']
+
+
+def test_extra_keys_survive_pickling(th):
+    profile = create_profile(th, DAYS, RETENTION_VALUES, form='power', profile_max=365)
+    profile['segment'] = 'US_facebook'
+    profile.evaluate([1, 2, 3])
+
+    restored = pickle.loads(pickle.dumps(profile))
+    assert restored['segment'] == 'US_facebook'
+    assert list(restored) == list(profile)
+    assert restored['best_fit'] == profile['best_fit']
+    np.testing.assert_array_equal(restored['retention_projection'][1], profile['retention_projection'][1])
+    np.testing.assert_array_equal(restored.evaluate([1, 2, 3]), profile.evaluate([1, 2, 3]))
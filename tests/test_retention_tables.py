@@ -0,0 +1,72 @@
+import warnings
+import pytest
+import numpy as np
+import pandas as pd
+
+TABLE = pd.DataFrame({
+    'segment': ['US', 'US', 'US', 'US', 'US', 'US', 'DE', 'DE', 'DE', 'DE'],
+    'install_date': ['01-01', '01-02', '01-01', '01-02', '01-01', '01-01', '01-01', '01-01', '01-01', '01-01'],
+    'day_n': [0, 0, 1, 1, 7, 30, 1, 7, 14, 60],
+    'installs': [1000, 3000, 1000, 3000, 1000, 1000, 500, 500, 500, 500],
+    'retained': [1000, 3000, 500, 900, 200, 0, 250, 100, 60, 0],
+})
+
+
+def test_rows_for_the_same_day_are_pooled(th):
+    days, retention_values, weights = th.aggregate_retention_table(TABLE[TABLE['segment'] == 'US'])
+    # day 0 is left out, and so is day 30, which retained no one
+    assert days == [1, 7]
+    # day 1 is (500 + 900) / (1000 + 3000) users, not the average of 50% and 30%
+    np.testing.assert_allclose(retention_values, [35, 20])
+    assert weights == [4000, 1000]
+
+
+def test_segments_are_aggregated_separately(th):
+    segments = th.aggregate_retention_table(TABLE, segment_column='segment')
+    assert sorted(segments) == ['DE', 'US']
+    assert segments['DE'][0] == [1, 7, 14]
+    np.testing.assert_allclose(segments['DE'][1], [50, 20, 12])
+    assert segments['US'][0] == [1, 7]
+
+
+def test_column_names_can_be_changed(th):
+    renamed = TABLE.rename(columns={'day_n': 'day', 'installs': 'users', 'retained': 'active'})
+    days, retention_values, weights = th.aggregate_retention_table(
+        renamed[renamed['segment'] == 'US'], day_column='day', installs_column='users', retained_column='active'
+    )
+    assert days == [1, 7]
+
+
+@pytest.mark.parametrize('column, value', [
+    ('day_n', -1),
+    ('day_n', 1.5),
+    ('installs', 0),
+    ('retained', -1),
+    ('retained', 5000),
+    ('retained', np.nan),
+])
+def test_bad_rows_are_rejected(th, column, value):
+    table = TABLE.copy()
+    table[column] = table[column].astype(float)
+    table.loc[3, column] = value
+    with pytest.raises(Exception):
+        th.aggregate_retention_table(table)
+
+
+def test_missing_column(th):
+    with pytest.raises(Exception):
+        th.aggregate_retention_table(TABLE.drop(columns=['retained']))
+
+
+def test_profile_from_table_is_weighted(th):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        profile = th.create_profile_from_table(TABLE[TABLE['segment'] == 'DE'], form='interpolate', profile_max=30)
+    assert profile['x'] == [1, 7, 14]
+    assert profile['weights'] == [500, 500, 500]
+
+
+def test_arrow_tables_are_aggregated_like_dataframes(th):
+    pa = pytest.importorskip('pyarrow')
+    segments = th.aggregate_retention_table(pa.Table.from_pandas(TABLE), segment_column='segment')
+    assert segments == th.aggregate_retention_table(TABLE, segment_column='segment')
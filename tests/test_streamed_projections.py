@@ -0,0 +1,63 @@
+import pytest
+import pandas as pd
+from theseus_growth import streamed_projections
+from tests.conftest import assert_same_frame
+
+COHORTS = list(range(1000, 3000, 40))
+
+
+def concatenated(chunks, key):
+    return pd.concat([chunk[key] for chunk in chunks], axis=1)
+
+
+@pytest.mark.parametrize('periods, chunk_size, start_date', [
+    (90, 7, 1),
+    (90, 90, 1),
+    (200, 30, 5),
+    (365, 1000, 1),
+])
+def test_streamed_DAU_matches_DAU_total(th, profile, periods, chunk_size, start_date):
+    chunks = list(th.stream_cohorted_DAU(profile, periods, COHORTS, chunk_size=chunk_size, start_date=start_date))
+    expected = th.DAU_total(th.project_cohorted_DAU(profile, periods, COHORTS, start_date=start_date))
+    pd.testing.assert_frame_equal(concatenated(chunks, 'DAU'), expected, check_dtype=False)
+
+
+def test_streamed_targeted_DAU_matches_DAU_total(th, profile):
+    chunks = list(th.stream_cohorted_DAU(profile, 120, COHORTS[:5], chunk_size=25, DAU_target=4000,
+                                         DAU_target_timeline=60))
+    expected = th.DAU_total(th.project_cohorted_DAU(profile, 120, COHORTS[:5], 4000, 60))
+    pd.testing.assert_frame_equal(concatenated(chunks, 'DAU'), expected, check_dtype=False)
+
+
+@pytest.mark.parametrize('periods, ages, chunk_size, start_date', [
+    (60, [1, 7, 30], 11, 1),
+    (60, [3, 14, 90], 60, 1),
+    (60, [3, 14, 90], 17, 5),
+])
+def test_streamed_aged_DAU_matches_project_aged_DAU(th, profile, periods, ages, chunk_size, start_date):
+    cohorts = COHORTS[:periods]
+    chunks = list(th.stream_cohorted_DAU(profile, periods, cohorts, ages=ages, chunk_size=chunk_size,
+                                         start_date=start_date))
+    for key, project in [('aged_DAU', th.project_aged_DAU), ('exact_aged_DAU', th.project_exact_aged_DAU)]:
+        expected = project(profile, periods, cohorts, ages, start_date)
+        result = concatenated(chunks, key)
+        if start_date != 1:
+            # the stream is on project_cohorted_DAU's dates, which start a day before the first cohort
+            # is acquired when start_date isn't 1, so project_aged_DAU's dates are the stream's shifted
+            # back by one day
+            assert (result.iloc[:, 0] == 0).all()
+            result = result.iloc[:, 1:].set_axis(expected.columns, axis=1)
+        assert_same_frame(result, expected)
+
+
+@pytest.mark.parametrize('periods, cohorts, kwargs', [
+    (1, [10], {}),
+    (30, [], {}),
+    (30, [10, 0], {}),
+    (30, [10], {'chunk_size': 0}),
+    (30, [10], {'ages': [0, 7]}),
+    (30, [10], {'DAU_target': 100, 'DAU_target_timeline': 40}),
+])
+def test_bad_parameters_raise_when_called(profile, periods, cohorts, kwargs):
+    with pytest.raises(Exception):
+        streamed_projections.stream_cohorted_DAU(profile, periods, cohorts, **kwargs)
@@ -0,0 +1,89 @@
+import pytest
+import pandas as pd
+
+pytest.importorskip('pyarrow')
+
+SEGMENTS = ['facebook', 'US/google ads', 'JP?tiktok&50%=x']
+
+
+@pytest.fixture(scope='module')
+def forward_DAU(th):
+    # the session profile fixture is parametrized, so these tests use a profile of their own
+    profile = th.create_profile([1, 3, 7, 14, 30], [80, 60, 45, 30, 20], form='power', profile_max=90)
+    return th.project_cohorted_DAU(profile, 60, list(range(1000, 3000, 100)))
+
+
+@pytest.mark.parametrize('file_format', ['parquet', 'feather'])
+@pytest.mark.parametrize('layout', ['wide', 'long'])
+def test_forward_DAU_round_trip(th, forward_DAU, tmp_path, file_format, layout):
+    file_name = str(tmp_path / 'forward_DAU')
+    getattr(th, 'to_' + file_format)(forward_DAU, file_name, layout=layout)
+    result = getattr(th, 'read_' + file_format)(file_name)
+    pd.testing.assert_frame_equal(result, forward_DAU, check_dtype=False)
+
+
+@pytest.mark.parametrize('file_format', ['parquet', 'feather'])
+@pytest.mark.parametrize('layout', ['wide', 'long'])
+def test_DAU_total_round_trip(th, forward_DAU, tmp_path, file_format, layout):
+    total = th.DAU_total(forward_DAU)
+    file_name = str(tmp_path / 'DAU_total')
+    getattr(th, 'to_' + file_format)(total, file_name, layout=layout)
+    result = getattr(th, 'read_' + file_format)(file_name)
+    pd.testing.assert_frame_equal(result, total, check_dtype=False)
+
+
+def test_unknown_layout(th, forward_DAU, tmp_path):
+    with pytest.raises(Exception):
+        th.to_parquet(forward_DAU, str(tmp_path / 'forward_DAU'), layout='tall')
+
+
+@pytest.mark.parametrize('file_format', ['parquet', 'feather'])
+@pytest.mark.parametrize('layout', ['wide', 'long'])
+def test_dataset_round_trip(th, forward_DAU, tmp_path, file_format, layout):
+    path = str(tmp_path / 'dataset')
+    totals = {}
+    for i, segment in enumerate(SEGMENTS):
+        totals[segment] = th.DAU_total(forward_DAU) * (i + 1)
+        th.append_to_dataset(totals[segment], path, segment, layout=layout, file_format=file_format)
+
+    dataset = th.read_dataset(path, file_format=file_format)
+    assert sorted(dataset.index.get_level_values('segment').unique()) == sorted(SEGMENTS)
+    for segment in SEGMENTS:
+        pd.testing.assert_frame_equal(dataset.loc[[segment]].droplevel('segment'), totals[segment], check_dtype=False)
+
+    selected = th.read_dataset(path, segments=[SEGMENTS[2]], file_format=file_format)
+    pd.testing.assert_frame_equal(selected.droplevel('segment'), totals[SEGMENTS[2]], check_dtype=False)
+
+
+def test_appended_projections_are_read_in_order(th, forward_DAU, tmp_path):
+    path = str(tmp_path / 'dataset')
+    total = th.DAU_total(forward_DAU)
+    for i in range(3):
+        th.append_to_dataset(total * (i + 1), path, SEGMENTS[1])
+
+    dataset = th.read_dataset(path).droplevel('segment')
+    assert len(dataset) == 3
+    for i in range(3):
+        assert list(dataset.iloc[i]) == list(total.iloc[0] * (i + 1))
+
+
+def test_projections_over_different_dates_are_filled(th, forward_DAU, tmp_path):
+    path = str(tmp_path / 'dataset')
+    total = th.DAU_total(forward_DAU)
+    th.append_to_dataset(total, path, 'long')
+    th.append_to_dataset(total.iloc[:, :30], path, 'short')
+
+    dataset = th.read_dataset(path)
+    assert list(dataset.loc['short'].iloc[0, 30:]) == [0] * 30
+    assert list(dataset.loc['long'].iloc[0]) == list(total.iloc[0])
+
+
+def test_missing_dataset_and_segment(th, forward_DAU, tmp_path):
+    path = str(tmp_path / 'dataset')
+    with pytest.raises(Exception):
+        th.read_dataset(path)
+    th.append_to_dataset(th.DAU_total(forward_DAU), path, SEGMENTS[0])
+    with pytest.raises(Exception):
+        th.read_dataset(path, segments=['google'])
+    with pytest.raises(Exception):
+        th.append_to_dataset(th.DAU_total(forward_DAU), path, SEGMENTS[0], file_format='csv')
@@ -0,0 +1,68 @@
+import warnings
+import pytest
+import numpy as np
+import pandas as pd
+from theseus_growth.uncertainty import StreamingQuantile
+from tests.conftest import DAYS, RETENTION_VALUES
+
+COHORTS = [1000, 1500, 800, 2000, 1200]
+
+
+@pytest.fixture(scope='module')
+def fitted_profile(th):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return th.create_profile(DAYS, RETENTION_VALUES, form='power', profile_max=365)
+
+
+def stream(p, values):
+    estimate = StreamingQuantile(p, values.shape[1])
+    for row in values:
+        estimate.update(row)
+    return estimate.value()
+
+
+def test_extreme_quantiles_are_the_minimum_and_maximum():
+    values = np.random.default_rng(0).normal(100, 20, size=(500, 7))
+    np.testing.assert_array_equal(stream(0, values), values.min(axis=0))
+    np.testing.assert_array_equal(stream(1, values), values.max(axis=0))
+
+
+def test_quantiles_of_a_few_values_are_exact():
+    values = np.random.default_rng(1).normal(100, 20, size=(4, 7))
+    for p in [0, 0.1, 0.5, 1]:
+        np.testing.assert_allclose(stream(p, values), np.quantile(values, p, axis=0))
+
+
+def test_streamed_median_is_close():
+    values = np.random.default_rng(2).normal(100, 20, size=(5000, 3))
+    np.testing.assert_allclose(stream(0.5, values), np.median(values, axis=0), atol=1.5)
+
+
+def test_quantiles_do_not_depend_on_the_number_of_workers(th, fitted_profile):
+    results = [
+        th.project_DAU_quantiles(fitted_profile, 60, COHORTS, draws=200, quantiles=(0, 0.5, 1), seed=7,
+                                 max_workers=workers, chunk_size=25)
+        for workers in [1, 2]
+    ]
+    for q in (0, 0.5, 1):
+        pd.testing.assert_frame_equal(results[0][q], results[1][q])
+
+    # the quantiles are ordered, and the P50 is close to the point projection
+    assert np.all(results[0][0].to_numpy() <= results[0][0.5].to_numpy())
+    assert np.all(results[0][0.5].to_numpy() <= results[0][1].to_numpy())
+    point = th.DAU_total(th.project_cohorted_DAU(fitted_profile, 60, COHORTS)).to_numpy()
+    np.testing.assert_allclose(results[0][0.5].to_numpy(), point, rtol=0.1, atol=5)
+
+
+def test_quantiles_repeat_with_a_seed(th, fitted_profile):
+    first = th.project_DAU_quantiles(fitted_profile, 30, COHORTS, draws=50, seed=3)
+    second = th.project_DAU_quantiles(fitted_profile, 30, COHORTS, draws=50, seed=3)
+    for q in first:
+        pd.testing.assert_frame_equal(first[q], second[q])
+
+
+def test_interpolated_profiles_are_rejected(th):
+    profile = th.create_profile(DAYS, RETENTION_VALUES, form='interpolate', profile_max=365)
+    with pytest.raises(Exception):
+        th.project_DAU_quantiles(profile, 30, COHORTS, draws=10)
@@ -24,20 +24,33 @@ OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 '''
 
-import numbers
-from theseus_growth import cohort_projections
-from theseus_growth import aged_DAU_projections
-from theseus_growth import graphs
-from theseus_growth import retention_profile
-from theseus_growth import theseus_io
-from theseus_growth import curve_functions
+import importlib
+
+#  the submodules are imported the first time they're used rather than when theseus_growth is imported,
+#  so eg. a headless projection job never pays for importing matplotlib, and theseus_growth.graphs
+#  etc. still work as attributes of the package (PEP 562)
+SUBMODULES = [
+    'cohort_projections', 'aged_DAU_projections', 'graphs', 'retention_profile', 'theseus_io',
+    'curve_functions', 'projection_cache', 'uncertainty', 'streamed_projections', 'profile_store',
+    'instrumentation', 'retention_tables'
+]
+
+
+def __getattr__(name):
+    if name in SUBMODULES:
+        return importlib.import_module('theseus_growth.' + name)
+    raise AttributeError("module 'theseus_growth' has no attribute " + repr(name))
+
+
+def __dir__():
+    return sorted(list(globals()) + SUBMODULES)
 
 
 class theseus():
 
-    # retention_profile = {
+    # retention_profile = RetentionProfile(
     #      x: [], 'y': [], 'errors': {}, 'best_fit': '', 'retention_profile' = ''
-    # }
+    # ), accessed like a dict
     #
 
     # # # #
@@ -48,78 +61,177 @@ class theseus():
 
         return None
 
-    def create_profile(self, days, retention_values, form='best_fit', profile_max=None):
+    def create_profile(self, days, retention_values, form='best_fit', profile_max=None, bounds=None, warm_start=None,
+                       weights=None, parallel=None, timeout=None, maxfev=None):
+        from theseus_growth import retention_profile
+        return retention_profile.create_profile(
+            days, retention_values, form, profile_max, bounds, warm_start, weights, parallel, timeout, maxfev
+        )
 
-        if self.test_retention_profile(days, retention_values):
-            profile = {'x': days, 'y': retention_values}
+    def create_profiles(self, segments, form='best_fit', profile_max=None, max_workers=None, chunksize=1,
+                        bounds=None, warm_starts=None):
+        from theseus_growth import retention_profile
+        return retention_profile.create_profiles(
+            segments, form, profile_max, max_workers, chunksize, bounds, warm_starts
+        )
 
-        if profile_max is not None and (not isinstance(profile_max, int) or profile_max < max(days)):
-            raise Exception("profile_max must be an integer greater than or equal to maximum value of Days data")
+    def update_profile(self, profile, new_days, new_values, new_weights=None, profile_max=None, bounds=None):
+        from theseus_growth import retention_profile
+        return retention_profile.update_profile(profile, new_days, new_values, new_weights, profile_max, bounds)
 
-        #  build the params attribute, which contains profile function curve shape parameters
-        #  if the best fit function is requested, use teh get_retention_projection_best_fit method
-        #  which iterates through all curve functions and finds the best fit (least squared error)
-        #  if a single form was provided, just get that
-        profile = retention_profile.get_retention_projection_best_fit(profile, profile_max)
-        if form == 'best_fit' or form == '' or form is None:
-            profile['retention_profile'] = 'best_fit'
-        else:
-            if form in curve_functions.processes or form == 'interpolate':
-                profile['retention_profile'] = form
-            else:
-                raise Exception('Invalid retention curve function provided')
+    def aggregate_retention_table(self, table, segment_column=None, day_column='day_n', installs_column='installs',
+                                  retained_column='retained'):
+        from theseus_growth import retention_tables
+        return retention_tables.aggregate_retention_table(
+            table, segment_column, day_column, installs_column, retained_column
+        )
 
-        profile['retention_projection'] = retention_profile.generate_retention_profile(profile, profile_max)
-        return profile
+    def create_profile_from_table(self, table, form='best_fit', profile_max=None, bounds=None, warm_start=None,
+                                  day_column='day_n', installs_column='installs', retained_column='retained'):
+        from theseus_growth import retention_tables
+        return retention_tables.create_profile_from_table(
+            table, form, profile_max, bounds, warm_start, day_column, installs_column, retained_column
+        )
+
+    def create_profiles_from_table(self, table, segment_column, form='best_fit', profile_max=None, max_workers=None,
+                                   chunksize=1, bounds=None, warm_starts=None, day_column='day_n',
+                                   installs_column='installs', retained_column='retained'):
+        from theseus_growth import retention_tables
+        return retention_tables.create_profiles_from_table(
+            table, segment_column, form, profile_max, max_workers, chunksize, bounds, warm_starts,
+            day_column, installs_column, retained_column
+        )
 
     def test_retention_profile(self, x_data, y_data):
-        # do both lists have the same number of elements?
-        if len(x_data) != len(y_data):
-            raise Exception('X and Y have differing numbers of data points')
-        if not all(isinstance(x, numbers.Real) for x in x_data):
-            raise Exception('X data can only contain integers')
-        if not all(isinstance(y, (int, float)) for y in y_data):
-            raise Exception('Y data can only contain integers and floats')
-        if not all((float(y) <= 100 and float(y) > 0) for y in y_data):
-            raise Exception('Y data must be less than or equal to 100 and more than 0')
-        if not all((x > 0) for x in x_data):
-            raise Exception('X data must be more than 0')
-        if x_data is None or y_data is None or len(x_data) < 2 or len(y_data) < 2:
-            raise Exception('Insufficient retention data provided!')
-
-        return True
+        from theseus_growth import retention_profile
+        return retention_profile.test_retention_profile(x_data, y_data)
+
+    def register_curve_form(self, name, function, guess=None, jacobian=None, domain=None):
+        from theseus_growth import curve_functions
+        return curve_functions.register_form(name, function, guess, jacobian, domain)
+
+    def unregister_curve_form(self, name):
+        from theseus_growth import curve_functions
+        curve_functions.unregister_form(name)
+
+    def save_profile(self, profile, file_name):
+        from theseus_growth import profile_store
+        profile_store.save_profile(profile, file_name)
+
+    def load_profile(self, file_name):
+        from theseus_growth import profile_store
+        return profile_store.load_profile(file_name)
+
+    def open_profile_store(self, path, backend='directory'):
+        from theseus_growth import profile_store
+        return profile_store.open_profile_store(path, backend)
+
+    def set_projection_cache_size(self, max_bytes):
+        from theseus_growth import projection_cache
+        projection_cache.cache.set_max_bytes(max_bytes)
+
+    def clear_projection_cache(self):
+        from theseus_growth import projection_cache
+        projection_cache.cache.clear()
+
+    def projection_cache_info(self):
+        from theseus_growth import projection_cache
+        return projection_cache.cache.info()
+
+    def instrument(self, trace_allocations=False, callback=None):
+        from theseus_growth import instrumentation
+        return instrumentation.Instrumentation(trace_allocations, callback)
 
     def plot_retention(self, profile, show_average_values=True):
+        from theseus_growth import graphs
         graphs.plot_retention(profile, show_average_values)
 
-    def project_cohorted_DAU(self, profile, periods, cohorts, DAU_target=None, DAU_target_timeline=None, start_date=1):
+    def project_cohorted_DAU(self, profile, periods, cohorts, DAU_target=None, DAU_target_timeline=None, start_date=1,
+                             storage='dense'):
+        from theseus_growth import cohort_projections
         return cohort_projections.project_cohorted_DAU(
+            profile, periods, cohorts, DAU_target, DAU_target_timeline, start_date, storage
+        )
+
+    def project_targeted_DNU(self, profile, periods, cohorts, DAU_target, DAU_target_timeline, start_date=1):
+        from theseus_growth import cohort_projections
+        return cohort_projections.project_targeted_DNU(
             profile, periods, cohorts, DAU_target, DAU_target_timeline, start_date
         )
 
+    def project_DAU_quantiles(self, profile, periods, cohorts, draws=1000, quantiles=(0.1, 0.5, 0.9), start_date=1,
+                              seed=None, max_workers=1, chunk_size=None):
+        from theseus_growth import uncertainty
+        return uncertainty.project_DAU_quantiles(
+            profile, periods, cohorts, draws, quantiles, start_date, seed, max_workers, chunk_size
+        )
+
+    def project_scenarios(self, profile, periods, cohort_matrix, start_date=1, method='auto'):
+        from theseus_growth import cohort_projections
+        return cohort_projections.project_scenarios(profile, periods, cohort_matrix, start_date, method)
+
+    def stream_cohorted_DAU(self, profile, periods, cohorts, ages=None, chunk_size=365, DAU_target=None,
+                            DAU_target_timeline=None, start_date=1):
+        from theseus_growth import streamed_projections
+        return streamed_projections.stream_cohorted_DAU(
+            profile, periods, cohorts, ages, chunk_size, DAU_target, DAU_target_timeline, start_date
+        )
+
     def DAU_total(self, forward_DAU):
+        from theseus_growth import cohort_projections
         return cohort_projections.DAU_total(forward_DAU)
 
     def plot_forward_DAU_stacked(self, forward_DAU, forward_DAU_labels, forward_DAU_dates,
                                  show_values=False, show_totals_values=False):
+        from theseus_growth import graphs
         graphs.plot_forward_DAU_stacked(
             forward_DAU, forward_DAU_labels, forward_DAU_dates, show_values, show_totals_values
         )
 
     def combine_DAU(self, DAU_totals, labels=None):
+        from theseus_growth import cohort_projections
         return cohort_projections.combine_DAU(DAU_totals, labels)
 
     def project_aged_DAU(self, profile, periods, cohorts, ages, start_date=1):
+        from theseus_growth import aged_DAU_projections
         return aged_DAU_projections.project_aged_DAU(profile, periods, cohorts, ages, start_date)
 
     def project_exact_aged_DAU(self, profile, periods, cohorts, ages, start_date=1):
+        from theseus_growth import aged_DAU_projections
         return aged_DAU_projections.project_exact_aged_DAU(profile, periods, cohorts, ages, start_date)
 
     def get_DNU(self, forward_DAU):
+        from theseus_growth import aged_DAU_projections
         return aged_DAU_projections.get_DNU(forward_DAU)
 
     def to_excel(self, df, file_name=None, sheet_name=None):
+        from theseus_growth import theseus_io
         theseus_io.to_excel(df, file_name, sheet_name)
 
     def to_json(self, df, file_name=None):
+        from theseus_growth import theseus_io
         theseus_io.to_json(df, file_name)
+
+    def to_parquet(self, df, file_name=None, layout='wide', compression='zstd'):
+        from theseus_growth import theseus_io
+        theseus_io.to_parquet(df, file_name, layout, compression)
+
+    def to_feather(self, df, file_name=None, layout='wide', compression='zstd'):
+        from theseus_growth import theseus_io
+        theseus_io.to_feather(df, file_name, layout, compression)
+
+    def read_parquet(self, file_name):
+        from theseus_growth import theseus_io
+        return theseus_io.read_parquet(file_name)
+
+    def read_feather(self, file_name):
+        from theseus_growth import theseus_io
+        return theseus_io.read_feather(file_name)
+
+    def append_to_dataset(self, df, path, segment, layout='long', file_format='parquet', compression='zstd'):
+        from theseus_growth import theseus_io
+        theseus_io.append_to_dataset(df, path, segment, layout, file_format, compression)
+
+    def read_dataset(self, path, segments=None, file_format='parquet'):
+        from theseus_growth import theseus_io
+        return theseus_io.read_dataset(path, segments, file_format)
@@ -3,11 +3,26 @@
 #  Will project out the number of people that are at least X days old on a given day
 # # # # # #
 
+import numpy as np
 import pandas as pd
 from theseus_growth import cohort_projections
+from theseus_growth.banded_DAU import BandedForwardDAU
+from theseus_growth import instrumentation
 
 
+@instrumentation.timed('get_DNU')
 def get_DNU(forward_DAU):
+    if isinstance(forward_DAU, BandedForwardDAU):
+        # build a list out of the DNU values
+        DNU_list = forward_DAU.diagonal().tolist()
+        # the single DNU row is built straight from the columns, the same as the row built below (the
+        # index column followed by the dates), without building a dense frame of every cohort and date
+        columns = [forward_DAU.index.name] + list(forward_DAU.columns)
+        return pd.DataFrame(
+            [DNU_list + ([0] * (len(columns) - len(forward_DAU)))],
+            index=pd.Index(['DNU'], name='Value'), columns=columns
+        )
+
     # build a list out of the DNU values
     DNU_list = [forward_DAU.iloc[x, x] for x in range(0, min(forward_DAU.shape))]
     # copy the forward_DAU structure and change the index name
@@ -22,6 +37,34 @@ def get_DNU(forward_DAU):
     return DNU_df
 
 
+@instrumentation.timed('age_matrix')
+def build_age_matrix(profile, periods, cohorts):
+    # # #  the DAU on each date broken out by the age of the users, as an ages x dates int array:
+    # # #  row a is the DAU on each date from the cohort that is a days old on that date
+    # # #  (age 0 being the day a cohort is acquired). cohort i is acquired on date i
+    # # #  so on date d the users who are a days old come from cohort d - a
+
+    age_matrix = np.zeros((periods, periods), dtype=np.int64)
+    if len(cohorts) == 0:
+        return age_matrix
+
+    # the DAU of each cohort at each age
+    projected_cohorts = cohort_projections.project_cohorts(cohorts, profile, periods)
+
+    ages = np.arange(periods)[:, np.newaxis]
+    cohort = np.arange(periods)[np.newaxis, :] - ages
+    acquired = (cohort >= 0) & (cohort < len(cohorts))
+
+    age_matrix = projected_cohorts[np.clip(cohort, 0, len(cohorts) - 1), ages]
+    age_matrix[~acquired] = 0
+    return age_matrix
+
+
+def build_aged_DAU(age_values, ages, dates):
+    return pd.DataFrame(age_values, index=pd.Index(ages, name='age'), columns=dates)
+
+
+@instrumentation.timed('project_aged_DAU')
 def project_aged_DAU(profile, periods, cohorts, ages, start_date=1):
     if len(ages) == 0:
         raise Exception("Age values cannot be empty")
@@ -34,38 +77,22 @@ def project_aged_DAU(profile, periods, cohorts, ages, start_date=1):
         start_date = 1
     dates = list(range(start_date, (start_date + periods)))
     dates = [str(x) for x in dates]
-    # create the blank dataframe that will contain the forward_DAU
-    aged_DAU = pd.DataFrame(columns=['age'] + dates).set_index('age')
     # remove any ages that are > the number of periods being projected out
     ages = [age for age in ages if age <= periods]
-    for i, age in enumerate(ages):
-        this_age = pd.DataFrame(columns=['age'] + dates).set_index('age')
-        this_age.loc[age] = [0] * len(dates)
-        aged_DAU = aged_DAU.append(this_age)
-
-    # # # go through the cohorts and get the ages
-    for i, cohort in enumerate(cohorts):
-        this_cohort = cohort_projections.project_cohort(cohort, profile, periods)
-        for j, age in enumerate(ages):
-            temp_cohort = this_cohort.copy()
-            this_age = aged_DAU.loc[[age]]
-            if age > 0:
-                # set 0s to the front of the cohort for each day that the cohort is less than age
-                temp_cohort[0: (age - 1)] = [0] * (age - 1)
-            if i > 0:
-                # shift the cohort right by the number of cohorts this is
-                temp_cohort = [0] * i + temp_cohort[: -i]
-            cohort_age = pd.DataFrame(columns=['age'] + dates).set_index('age')
-            cohort_age.loc[age] = temp_cohort
-            aged_DAU.loc[[age]] = this_age.add(cohort_age, fill_value=0)
-
-    return aged_DAU
+
+    # the number of users that are at least each age on each date is the sum of the age matrix
+    # from that age onwards, so a reverse cumulative sum over the ages gives every age in one pass
+    # users are 1 day old (ie. age 1) on the day they're acquired, which is row 0 of the age matrix
+    at_least_age = np.cumsum(build_age_matrix(profile, periods, cohorts)[::-1], axis=0)[::-1]
+
+    return build_aged_DAU(at_least_age[[age - 1 for age in ages]], ages, dates)
 
 
 # # # # # #
 #  Project Exact Aged DAU
 #  Will project out the number of people that are exactly X days old on a given day
 # # # # # #
+@instrumentation.timed('project_exact_aged_DAU')
 def project_exact_aged_DAU(profile, periods, cohorts, ages, start_date=1):
     # create a list of dates
     if len(ages) == 0:
@@ -79,31 +106,10 @@ def project_exact_aged_DAU(profile, periods, cohorts, ages, start_date=1):
 
     dates = list(range(start_date, (start_date + periods)))
     dates = [str(x) for x in dates]
-    # create the blank dataframe that will contain the forward_DAU
-    aged_DAU = pd.DataFrame(columns=['age'] + dates).set_index('age')
     # remove any ages that are > the number of periods being projected out
     ages = [age for age in ages if age <= periods]
-    for i, age in enumerate(ages):
-        this_age = pd.DataFrame(columns=['age']+dates).set_index('age')
-        this_age.loc[age] = [0] * len(dates)
-        aged_DAU = aged_DAU.append(this_age)
-
-    # # # go through the cohorts and get the ages
-    for i, cohort in enumerate(cohorts):
-        this_cohort = cohort_projections.project_cohort(cohort, profile, periods)
-        for j, age in enumerate(ages):
-            temp_cohort = this_cohort.copy()
-            this_age = aged_DAU.loc[[age]]
-            if age > 0:
-                # set 0s to the front of the cohort for each day that the cohort is less than age
-                temp_cohort[0: (age - 1)] = [0] * (age - 1)
-                # set to 0 anything after the first day of the cohort
-                temp_cohort[age:] = [0] * (len(temp_cohort) - age)
-            if i > 0:
-                # shift the cohort right by the number of cohorts this is
-                temp_cohort = [0] * i + temp_cohort[: -i]
-            cohort_age = pd.DataFrame(columns=['age'] + dates).set_index('age')
-            cohort_age.loc[age] = temp_cohort
-            aged_DAU.loc[[age]] = this_age.add(cohort_age, fill_value=0)
-
-    return aged_DAU
+
+    # the number of users that are exactly each age on each date is just that row of the age matrix
+    exact_age = build_age_matrix(profile, periods, cohorts)
+
+    return build_aged_DAU(exact_age[[age - 1 for age in ages]], ages, dates)
@@ -0,0 +1,105 @@
+# # # #
+#  Banded Forward DAU
+#  A compact alternative to the forward_DAU dataframe: each cohort only has non-zero DAU in a band
+#  that starts on the date it was acquired and ends when its retention drops to 0, so rather than
+#  a cohorts x dates table, each cohort is stored as its size and the date its band starts on,
+#  and the DAU in the band is the shared retention vector scaled by the cohort size
+# # # #
+
+import numpy as np
+import pandas as pd
+
+
+class BandedForwardDAU():
+
+    def __init__(self, retention, cohorts, starts, dates, cohort_dates=None, chunk_size=1024):
+        # retention is the retention vector (by age, from day 0) that every cohort shares
+        # cohorts are the cohort sizes and starts are the index of the date each cohort is acquired on
+        # dates are the column labels of the projection and cohort_dates are its index labels
+        retention = np.asarray(retention, dtype=float)
+        # only the retention up to the last age that retains anyone is needed
+        nonzero = np.flatnonzero(retention)
+        self.retention = retention[: (nonzero[-1] + 1 if len(nonzero) else 0)].copy()
+
+        self.cohorts = np.asarray(cohorts, dtype=np.int64)
+        self.starts = np.asarray(starts, dtype=np.int64)
+        if len(self.cohorts) != len(self.starts):
+            raise Exception('Each cohort must have a start date')
+
+        self.columns = pd.Index(dates)
+        if cohort_dates is None:
+            cohort_dates = np.arange(1, len(self.cohorts) + 1)
+        self.index = pd.Index(cohort_dates, name='cohort_date')
+        self.chunk_size = chunk_size
+
+    def __len__(self):
+        return len(self.cohorts)
+
+    @property
+    def shape(self):
+        return (len(self.cohorts), len(self.columns))
+
+    @property
+    def nbytes(self):
+        return self.retention.nbytes + self.cohorts.nbytes + self.starts.nbytes
+
+    def add_cohorts(self, cohorts, starts):
+        # a new BandedForwardDAU with cohorts appended, eg. the cohorts needed to hit a DAU target
+        return BandedForwardDAU(
+            self.retention,
+            np.concatenate([self.cohorts, np.asarray(cohorts, dtype=np.int64)]),
+            np.concatenate([self.starts, np.asarray(starts, dtype=np.int64)]),
+            self.columns,
+            np.arange(1, len(self.cohorts) + len(cohorts) + 1),
+            self.chunk_size
+        )
+
+    def bands(self, rows):
+        # the DAU of the cohorts in rows at each age of their band, truncated to whole users
+        return np.trunc(np.multiply.outer(self.cohorts[rows].astype(float), self.retention) / 100).astype(np.int64)
+
+    def iter_bands(self):
+        # yields (rows, date indices, DAU) for the cells of chunk_size cohorts at a time
+        # that fall inside the projection, so no more than one chunk of bands is ever held in memory
+        ages = np.arange(len(self.retention))
+        for first in range(0, len(self.cohorts), self.chunk_size):
+            rows = np.arange(first, min(first + self.chunk_size, len(self.cohorts)))
+            dates = self.starts[rows, np.newaxis] + ages[np.newaxis, :]
+            inside = (dates >= 0) & (dates < len(self.columns))
+            rows_grid = np.broadcast_to(rows[:, np.newaxis], dates.shape)
+            yield rows_grid[inside], dates[inside], self.bands(rows)[inside]
+
+    def totals(self):
+        # the total DAU on each date, as an int array
+        totals = np.zeros(len(self.columns), dtype=np.int64)
+        for rows, dates, DAU in self.iter_bands():
+            np.add.at(totals, dates, DAU)
+        return totals
+
+    def sum(self):
+        # the column sums, as DataFrame.sum() would give them for the dense projection
+        return pd.Series(self.totals(), index=self.columns)
+
+    def diagonal(self):
+        # the value of each cohort on the date with the same index as its row,
+        # eg. the DNU when the projection starts on date 1
+        diagonal_rows = np.arange(min(self.shape))
+        ages = diagonal_rows - self.starts[diagonal_rows]
+        in_band = (ages >= 0) & (ages < len(self.retention))
+
+        diagonal = np.zeros(len(diagonal_rows), dtype=np.int64)
+        diagonal[in_band] = np.trunc(
+            self.cohorts[diagonal_rows[in_band]] * self.retention[ages[in_band]] / 100
+        ).astype(np.int64)
+        return diagonal
+
+    def to_numpy(self):
+        # the dense cohorts x dates int array
+        matrix = np.zeros(self.shape, dtype=np.int64)
+        for rows, dates, DAU in self.iter_bands():
+            matrix[rows, dates] = DAU
+        return matrix
+
+    def to_dataframe(self):
+        # the dense forward_DAU dataframe, identical to the one project_cohorted_DAU builds by default
+        return pd.DataFrame(self.to_numpy(), index=self.index, columns=self.columns)
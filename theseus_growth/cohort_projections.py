@@ -2,20 +2,28 @@
 #  Projection Functions
 # # # #
 
+import numpy as np
 import pandas as pd
-from scipy.stats import linregress
+from theseus_growth.banded_DAU import BandedForwardDAU
+from theseus_growth import instrumentation
 
 
-def build_cohort(cohorts, date, cohort_size):
-    cohort = pd.DataFrame(columns=['date', 'cohort_size'])
+def build_cohorts(dates, cohort_sizes):
+    # builds the cohorts dataframe in one go from its columns
+    # every row keeps an index of 0, as the single-row cohorts that used to be appended one at a time did
+    return pd.DataFrame(
+        {'date': np.asarray(dates, dtype=np.int64), 'cohort_size': np.asarray(cohort_sizes, dtype=np.int64)},
+        index=np.zeros(len(cohort_sizes), dtype=np.int64)
+    )
 
-    cohort.loc[0] = [date, cohort_size]
-    return cohort
+
+def build_cohort(cohorts, date, cohort_size):
+    return build_cohorts([date], [cohort_size])
 
 
 def add_cohort(cohorts, date, cohort_size):
     this_cohort = build_cohort(cohorts, date, cohort_size)
-    cohorts = cohorts.append(this_cohort)
+    cohorts = pd.concat([cohorts, this_cohort])
     return cohorts
 
 
@@ -23,50 +31,88 @@ def create_cohorts(cohorts_DNU, start_date=None):
     # cohorts DNU is a list of ints
     # these are the cohorts of NEW users
 
-    cohorts = pd.DataFrame()
+    if start_date is None or start_date == 0:
+        start_date = 1
     if start_date < 0:
         raise Exception("Invalid start date")
 
-    if start_date is None or start_date == 0:
-        start_date = 1
-    this_date = start_date
-    for i, cohort_size in enumerate(cohorts_DNU):
-        cohort = build_cohort(cohorts, (this_date), cohort_size)
-        cohorts = cohorts.append(cohort)
-        this_date += 1
-    return cohorts
+    # each cohort is dated one day after the previous cohort
+    dates = np.arange(start_date, start_date + len(cohorts_DNU))
+    return build_cohorts(dates, cohorts_DNU)
 
 
 def build_DAU_trajectory(start_DAU, end_DAU, periods):
     x = [1, periods]
     y = [start_DAU, end_DAU]
 
+    # scipy.stats is slow to import and only needed here, so it's imported on first use
+    from scipy.stats import linregress
     model = linregress(x, y)
 
     return model
 
 
-def project_cohort(cohort, profile, periods):
+def get_retention_vector(profile, periods):
+    # the retention projection as a float array of length periods, indexed by age in days
+    # (day 0 is always 100). the horizon of the projection is applied here once: any age past
+    # the end of the retention projection retains no one
+    projection = np.asarray(profile['retention_projection'][1], dtype=float)
+    horizon = min(periods, len(projection))
+
+    retention = np.zeros(periods)
+    retention[:horizon] = projection[:horizon]
+    return retention
+
+
+def project_cohort(cohort, profile, periods, retention=None):
+    # projects the DAU of a single cohort out over periods as an int array, truncated to whole users
+    # retention is the retention vector from get_retention_vector, which can be computed
+    # once and passed in when many cohorts are projected from the same profile
+    if retention is None:
+        retention = get_retention_vector(profile, periods)
+
+    return np.trunc(cohort * retention[:periods] / 100).astype(np.int64)
+
+
+def project_cohorts(cohorts, profile, periods, retention=None):
+    # the batched version of project_cohort: projects a whole list of cohort sizes at once
+    # into a cohorts x periods int array (row i is project_cohort(cohorts[i], ...))
+    if retention is None:
+        retention = get_retention_vector(profile, periods)
+
+    cohorts = np.asarray(cohorts, dtype=float)
+    return np.trunc(np.multiply.outer(cohorts, retention[:periods]) / 100).astype(np.int64)
 
-    # the function name for the best fit
-    # if profile['retention_profile'] == 'best_fit':
-    #    form = profile[profile['retention_profile']]
-    # else:
-    #     form = profile['retention_profile']
-    # this_func = form + '_func' # never used?
-    # this_params = profile['params'][form] # never used?
 
-    # this iterates through the retention values list up through the #  of periods being projected out
-    # if the period number is > the max x value that was used to build the retention projection, it gives 0
-    this_cohort = [
-        int(cohort * profile['retention_projection'][1][i]/100)
-        if i <= max(profile['retention_projection'][0]) else 0 for i in range(0, periods)
-    ]
+@instrumentation.timed('cohort_matrix')
+def build_cohort_matrix(profile, periods, cohorts, start_date=1, first_cohort=0):
+    # # #  vectorized equivalent of calling build_forward_DAU once per cohort:
+    # # #  builds the entire cohorts x dates matrix of DAU in a single pass.
+    # # #  each cohort is projected out over its lifetime with one outer product against
+    # # #  the retention vector, and then every cell is mapped back to the age of its
+    # # #  cohort on that date (Toeplitz-style indexing) so that cohort i starts i dates later
+    # # #  first_cohort is the row number of the first cohort, for adding cohorts to an existing forward_DAU
 
-    return this_cohort
+    # the DAU for each cohort at each age
+    projected = project_cohorts(cohorts, profile, periods)
 
+    # when the start date isn't 1 the dates run for an extra period and every
+    # cohort is pushed right by one date
+    offset = 0 if start_date == 1 else 1
+    ages = (
+        np.arange(periods + offset)[np.newaxis, :]
+        - np.arange(first_cohort, first_cohort + len(cohorts))[:, np.newaxis]
+        - offset
+    )
+
+    # cohorts that haven't been acquired yet on a given date contribute 0
+    matrix = np.take_along_axis(projected, np.clip(ages, 0, periods - 1), axis=1)
+    matrix[ages < 0] = 0
+
+    return matrix
 
-def build_forward_DAU(profile, forward_DAU, cohort, periods, start_date):
+
+def build_forward_DAU(profile, forward_DAU, cohort, periods, start_date, retention=None):
     # # #  this function takes a set of cohorts (which is a list of DNU)
     # # #  and a retention profile and projects out what the DAU will be
     # # #  based on the retention to some map_length
@@ -84,7 +130,7 @@ def build_forward_DAU(profile, forward_DAU, cohort, periods, start_date):
     # this_params = profile['params'][form]
 
     # build the cohort out by periods
-    this_cohort = project_cohort(cohort, profile, periods)
+    this_cohort = project_cohort(cohort, profile, periods, retention).tolist()
 
     # need to insert 0s to the beginning depending on where it goes in the lifetime
     # eg if it's the first cohort, no zeroes
@@ -105,8 +151,9 @@ def build_forward_DAU(profile, forward_DAU, cohort, periods, start_date):
     return forward_DAU
 
 
+@instrumentation.timed('DAU_total')
 def DAU_total(forward_DAU):
-    if not isinstance(forward_DAU, pd.DataFrame) or len(forward_DAU) < 2:
+    if not isinstance(forward_DAU, (pd.DataFrame, BandedForwardDAU)) or len(forward_DAU) < 2:
         raise Exception('Forward DAU Projection is malformed. Must be a dataframe with at least 2 rows.')
 
     # get the sums of the columns
@@ -123,7 +170,17 @@ def DAU_total(forward_DAU):
     return DAU_total
 
 
+#  columns of a projection that aren't dates
+NON_DATE_COLUMNS = ['DAU', 'profile', 'cohort_date', 'age', 'Value']
+
+
+@instrumentation.timed('combine_DAU')
 def combine_DAU(DAU_totals, labels=None):
+    # # #  stacks DAU totals (or any projections with a column per date) into one dataframe with a row per
+    # # #  row of each projection, indexed by its label or labels ('profile'). the dates are the union of every
+    # # #  projection's dates, in order, and a projection has 0 DAU on any date it doesn't cover.
+    # # #  every projection is placed into a single array, so the work grows linearly with the number
+    # # #  of projections, and the projections passed in aren't modified
 
     if len(DAU_totals) < 2:
         raise Exception('Must provide at least two sets of DAU projections to combine.')
@@ -131,38 +188,42 @@ def combine_DAU(DAU_totals, labels=None):
     if labels is not None and (len(DAU_totals) != len(labels)):
         raise Exception('Number of labels doesnt match number of DAU projections provided.')
 
-    combined_DAU = DAU_totals[0]
-    combined_DAU = combined_DAU.reset_index()
-    if labels is not None:
-        combined_DAU['profile'] = labels[0]
-
-    i = 1
-    for DAU_total in DAU_totals[1:]:
-        if labels is not None:
-            DAU_total['profile'] = labels[i]
-            DAU_total.reset_index().set_index(['profile'])
-        common = list(set(combined_DAU.columns.tolist()) & set(DAU_total.columns.tolist()))
-        combined_DAU = pd.merge(combined_DAU, DAU_total, on=common, how='outer').fillna(0)
-        i += 1
-
-    # sort the columns
-    columns = sorted(
-        [int(c) for c in combined_DAU.columns if c not in ['DAU', 'profile', 'cohort_date', 'age', 'Value']]
+    if labels is None:
+        labels = list(range(len(DAU_totals)))
+
+    # each projection's values and the integer dates of its columns
+    values = []
+    dates = []
+    for DAU_total in DAU_totals:
+        date_columns = [c for c in DAU_total.columns if c not in NON_DATE_COLUMNS]
+        values.append(DAU_total[date_columns].infer_objects().to_numpy())
+        dates.append(np.asarray(date_columns).astype(np.int64))
+
+    all_dates = np.unique(np.concatenate(dates))
+    row_counts = [len(v) for v in values]
+
+    combined_DAU = np.zeros((sum(row_counts), len(all_dates)), dtype=np.result_type(*values))
+    row = 0
+    for these_values, these_dates in zip(values, dates):
+        combined_DAU[row:row + len(these_values), np.searchsorted(all_dates, these_dates)] = these_values
+        row += len(these_values)
+
+    # a label is either one label for all of a projection's rows or a list with a label for each row
+    index = []
+    for label, row_count in zip(labels, row_counts):
+        if isinstance(label, (list, tuple, np.ndarray, pd.Index)):
+            if len(label) != row_count:
+                raise Exception('Number of labels doesnt match number of rows in the DAU projection.')
+            index.extend(label)
+        else:
+            index.extend([label] * row_count)
+
+    return pd.DataFrame(
+        combined_DAU, index=pd.Index(index, dtype=object, name='profile'), columns=[str(d) for d in all_dates]
     )
-    columns = [str(c) for c in columns]
-    if labels is not None:
-        columns += ['profile']
-    # combined_DAU = combined_DAU.reindex(
-    #    sorted(combined_DAU.columns, key=lambda x: float(combined_DAU.columns)), axis=1
-    # )
-    combined_DAU = combined_DAU[columns]
-
-    combined_DAU.reset_index()
-
-    return combined_DAU.set_index('profile')
 
 
-def project_targeted_DAU(profile, forward_DAU, periods, cohorts, DAU_target, DAU_target_timeline, start_date):
+def test_DAU_target(periods, cohorts, DAU_target_timeline):
     if DAU_target_timeline is None:
         raise Exception('DAU Target Projections require a DAU Target Timeline')
 
@@ -172,17 +233,31 @@ def project_targeted_DAU(profile, forward_DAU, periods, cohorts, DAU_target, DAU
             DAU target timeline must be less than or equal to the number of periods minus the number of cohorts.
         ''')
 
-    tracker = len(cohorts) + 1
+    return True
+
+
+@instrumentation.timed('targeted_DNU')
+def solve_targeted_DNU(profile, DAU, periods, cohorts, DAU_target, DAU_target_timeline, start_date, retention=None):
+    # # #  finds the DNU needed each day to move DAU in a straight line from its current value to DAU_target
+    # # #  DAU is an array of the total DAU on each date from the cohorts that already exist.
+    # # #  total DAU is the triangular convolution of the DNU with the retention vector, so this
+    # # #  solves that system by forward substitution: the cohort added on each date is whatever
+    # # #  is missing from that date's target, and its projection is added onto every later date.
+    # # #  returns an int array of the new cohorts (the existing cohorts aren't included)
+
+    if retention is None:
+        retention = get_retention_vector(profile, periods)
+
+    DAU = np.array(DAU, dtype=np.int64)
+    offset = 0 if start_date == 1 else 1
 
     # start projections
-    start_DAU = forward_DAU.iloc[:, tracker - 1].sum()  # the current value of DAU
+    start_DAU = DAU[len(cohorts) - 1]  # the current value of DAU
 
     #  this builds a list of DAU values needed to hit the DAU target over the timeline
     #  it uses a straight linear regression and just comes up with DAU values
-    #  the reason it starts from tracker - 1 is that we want the model to project
+    #  the reason it starts from the last cohort's date is that we want the model to project
     #  from the *current* value to target, not the day after the last cohort
-    #  keep in mind that the entire timeline is projected out, which is why the
-    #  tracker is needed in the first place (otherwise we could just use last column of df)
     model = build_DAU_trajectory(start_DAU, DAU_target, (DAU_target_timeline + 1 - len(cohorts)))
 
     #  get the DAU values that we need each day to linearly progress to the target DAU
@@ -190,24 +265,95 @@ def project_targeted_DAU(profile, forward_DAU, periods, cohorts, DAU_target, DAU
     #  which is the last value of the existing cohorts
     DAU_values = [int(model[0] * i + model[1]) for i in range(1, (DAU_target_timeline + 2 - len(cohorts)))][1:]
 
-    for DAU_target in DAU_values:
+    DNU = np.zeros(len(DAU_values), dtype=np.int64)
+    for i, DAU_target in enumerate(DAU_values):
+        # the new cohort is measured against the DAU on the date after the latest cohort
+        date = len(cohorts) + i
+        DNU[i] = max(DAU_target - DAU[date], 0)
+
+        # add the new cohort's projection onto the DAU from the date it's acquired
+        first_date = date + offset
+        if first_date < len(DAU):
+            DAU[first_date:] += project_cohort(DNU[i], profile, len(DAU) - first_date, retention)
+
+    return DNU
+
+
+def project_targeted_DNU(profile, periods, cohorts, DAU_target, DAU_target_timeline, start_date=1):
+    # # #  the DNU series (the existing cohorts followed by the cohorts needed to hit DAU_target)
+    # # #  of a targeted DAU projection, without building the forward_DAU dataframe
+
+    if not isinstance(periods, int) or periods < 2:
+        raise Exception("The periods parameter must be an integer greater than 1")
+
+    if len(cohorts) < 1 or not all(isinstance(x, int) for x in cohorts) or not all(x >= 1 for x in cohorts):
+        raise Exception("Must provide at least one cohort value, and all cohort values must be greater than 0")
+
+    if DAU_target is None:
+        raise Exception('DAU Target Projections require a DAU Target')
+
+    if DAU_target_timeline is not None and DAU_target_timeline > periods:
+        raise Exception("DAU target timeline is longer than the number of periods being projected")
+
+    test_DAU_target(periods, cohorts, DAU_target_timeline)
+
+    if start_date == 0 or start_date is None:
+        start_date = 1
+    offset = 0 if start_date == 1 else 1
+
+    # the total DAU on each date from the existing cohorts
+    retention = get_retention_vector(profile, periods)
+    DAU = np.zeros(periods + offset, dtype=np.int64)
+    for i, cohort in enumerate(cohorts):
+        DAU[i + offset:] += project_cohort(cohort, profile, periods - i, retention)
+
+    DNU = solve_targeted_DNU(
+        profile, DAU, periods, cohorts, DAU_target, DAU_target_timeline, start_date, retention
+    )
+
+    return np.concatenate([np.asarray(cohorts, dtype=np.int64), DNU])
+
+
+def project_targeted_DAU(profile, forward_DAU, periods, cohorts, DAU_target, DAU_target_timeline, start_date):
+    test_DAU_target(periods, cohorts, DAU_target_timeline)
+
+    # the current total DAU on each date
+    DAU = forward_DAU.drop(columns=['cohort_date']).sum().to_numpy()
+
+    DNU = solve_targeted_DNU(profile, DAU, periods, cohorts, DAU_target, DAU_target_timeline, start_date)
+
+    # add all of the new cohorts to forward_DAU at once
+    targeted_DAU = pd.DataFrame(
+        build_cohort_matrix(profile, periods, DNU, start_date, first_cohort=len(forward_DAU)),
+        columns=forward_DAU.columns[1:]
+    )
+    targeted_DAU.insert(0, 'cohort_date', np.arange(len(forward_DAU), len(forward_DAU) + len(DNU)))
 
-        if len(forward_DAU) > len(forward_DAU.columns.tolist()):
-            forward_DAU[str(int(forward_DAU.columns.tolist()[-1]) + 1)] = [0] * (len(forward_DAU))
+    return pd.concat([forward_DAU, targeted_DAU], ignore_index=True)
 
-        # the current value of DAU is the sum of the last column of forward_DAU
-        start_DAU = forward_DAU.iloc[:, tracker].sum()
-        DAU_needed = (0 if DAU_target - start_DAU < 0 else DAU_target - start_DAU)
 
-        forward_DAU = build_forward_DAU(profile, forward_DAU, DAU_needed, periods, start_date)
+def project_banded_DAU(profile, periods, cohorts, DAU_target, DAU_target_timeline, start_date, dates):
+    # # #  the forward DAU projection stored as a BandedForwardDAU rather than a dataframe
 
-        tracker += 1
+    retention = get_retention_vector(profile, periods)
+    offset = 0 if start_date == 1 else 1
+    forward_DAU = BandedForwardDAU(retention, cohorts, np.arange(len(cohorts)) + offset, dates)
+
+    if DAU_target is not None:
+        test_DAU_target(periods, cohorts, DAU_target_timeline)
+        DNU = solve_targeted_DNU(
+            profile, forward_DAU.totals(), periods, cohorts, DAU_target, DAU_target_timeline, start_date, retention
+        )
+        forward_DAU = forward_DAU.add_cohorts(DNU, np.arange(len(cohorts), len(cohorts) + len(DNU)) + offset)
 
     return forward_DAU
 
 
+@instrumentation.timed('project_cohorted_DAU')
 def project_cohorted_DAU(profile, periods, cohorts, DAU_target=None,
-                         DAU_target_timeline=None, start_date=1):
+                         DAU_target_timeline=None, start_date=1, storage='dense'):
+    # storage='banded' returns a BandedForwardDAU, which only stores each cohort's size and start date,
+    # instead of the dense dataframe. its to_dataframe() method gives the dense dataframe
 
     if not isinstance(periods, int) or periods < 2:
         raise Exception("The periods parameter must be an integer greater than 1")
@@ -218,6 +364,9 @@ def project_cohorted_DAU(profile, periods, cohorts, DAU_target=None,
     if DAU_target is not None and DAU_target_timeline is not None and DAU_target_timeline > periods:
         raise Exception("DAU target timeline is longer than the number of periods being projected")
 
+    if storage not in ['dense', 'banded']:
+        raise Exception("The storage parameter must be either 'dense' or 'banded'")
+
     if start_date == 0 or start_date is None:
         start_date = 1
 
@@ -229,11 +378,15 @@ def project_cohorted_DAU(profile, periods, cohorts, DAU_target=None,
 
     dates = [str(x) for x in dates]
 
-    # create the blank dataframe that will contain the forward_DAU
-    forward_DAU = pd.DataFrame(columns=['cohort_date'] + dates)
-    # build the initial forward DAU from the cohorts
-    for cohort in cohorts:
-        forward_DAU = build_forward_DAU(profile, forward_DAU, cohort, periods, start_date)
+    if storage == 'banded':
+        return project_banded_DAU(profile, periods, cohorts, DAU_target, DAU_target_timeline, start_date, dates)
+
+    # build the initial forward DAU from the cohorts in one pass
+    # and only wrap it in a dataframe once
+    matrix = build_cohort_matrix(profile, periods, cohorts, start_date)
+    with instrumentation.stage('forward_DAU_frame', size=matrix.size):
+        forward_DAU = pd.DataFrame(matrix, columns=dates)
+        forward_DAU.insert(0, 'cohort_date', np.arange(len(cohorts)))
 
     # if DAU_target is set, it means we are trying to build to some target
     if DAU_target is not None:
@@ -244,3 +397,62 @@ def project_cohorted_DAU(profile, periods, cohorts, DAU_target=None,
     forward_DAU['cohort_date'] = forward_DAU['cohort_date'] + 1
 
     return forward_DAU.set_index('cohort_date')
+
+
+#  the largest cohorts x dates retention matrix project_scenarios will multiply against before
+#  switching to FFT convolution
+MAX_SCENARIO_MATRIX_CELLS = 2 ** 22
+
+
+@instrumentation.timed('project_scenarios')
+def project_scenarios(profile, periods, cohort_matrix, start_date=1, method='auto'):
+    # # #  projects total DAU for many DNU plans (scenarios) against the same profile at once.
+    # # #  cohort_matrix is a scenarios x days array of DNU, one row per plan (shorter plans can be
+    # # #  padded with 0s), and the result is a scenarios x dates array of total DAU on the same dates as
+    # # #  project_cohorted_DAU. total DAU is the convolution of each DNU vector with the retention vector:
+    # # #  'matmul' multiplies the DNU by a Toeplitz matrix of the retention vector, 'fft' convolves with
+    # # #  FFTs and 'auto' picks whichever suits the size. these give the expected DAU as floats; 'exact'
+    # # #  rounds each cohort down to whole users like project_cohorted_DAU, so it matches DAU_total.
+    # # #  the float methods are above 'exact' by less than 1 user for every cohort active on a date (so by up
+    # # #  to the number of cohorts), and agree with each other to within floating point rounding
+
+    if not isinstance(periods, int) or periods < 2:
+        raise Exception("The periods parameter must be an integer greater than 1")
+
+    if method not in ['auto', 'matmul', 'fft', 'exact']:
+        raise Exception("The method parameter must be one of 'auto', 'matmul', 'fft' or 'exact'")
+
+    DNU = np.array(cohort_matrix, dtype=float, ndmin=2)
+    if DNU.ndim != 2 or DNU.shape[1] < 1:
+        raise Exception("The cohort matrix must be a 2-dimensional array of scenarios x cohorts")
+    if not np.all(np.isfinite(DNU)) or np.any(DNU < 0):
+        raise Exception("All cohort values must be 0 or greater")
+
+    if start_date == 0 or start_date is None:
+        start_date = 1
+    offset = 0 if start_date == 1 else 1
+
+    retention = get_retention_vector(profile, periods)
+    # cohorts acquired after the last date don't contribute to any date
+    cohort_count = min(DNU.shape[1], periods)
+    DNU = DNU[:, :cohort_count]
+
+    if method == 'auto':
+        method = 'matmul' if cohort_count * periods <= MAX_SCENARIO_MATRIX_CELLS else 'fft'
+
+    DAU = np.zeros((DNU.shape[0], periods + offset))
+    if method == 'exact':
+        # add each cohort's projection onto the dates it's active, for every scenario at once
+        for i in range(cohort_count):
+            DAU[:, i + offset:] += np.trunc(np.multiply.outer(DNU[:, i], retention[: periods - i]) / 100)
+        return DAU.astype(np.int64)
+    elif method == 'matmul':
+        # row i of the Toeplitz matrix is the retention vector shifted right by i dates
+        ages = np.arange(periods)[np.newaxis, :] - np.arange(cohort_count)[:, np.newaxis]
+        retention_matrix = np.where(ages >= 0, retention[np.clip(ages, 0, None)], 0)
+        DAU[:, offset:] = DNU @ retention_matrix / 100
+    else:
+        from scipy.signal import fftconvolve
+        DAU[:, offset:] = fftconvolve(DNU, retention[np.newaxis, :], axes=1)[:, :periods] / 100
+
+    return DAU
@@ -1,60 +1,218 @@
 # # # # # # # # # # #
 #  functions pertaining to the different curve functions that can be applied to the data
+#
+#  every curve form that retention can be fit to is registered in forms, by name, with its kernel
+#  (the function itself), the initial guess of its parameters, its optional analytic jacobian and the
+#  optional domain of its parameters. the kernels are plain vectorized numpy expressions with no side
+#  effects: floating point errors are ignored around the fitting and projecting that calls them, rather
+#  than in the kernels themselves. custom forms are added with register_form
 # # # # # # # # # # #
 import numpy as np
-from scipy.interpolate import interp1d
-from scipy.interpolate import InterpolatedUnivariateSpline
-import warnings
+from theseus_growth import projection_cache
 
 
-processes = ['log', 'exp', 'linear', 'quad', 'weibull', 'power']
+#  the names of the registered forms, in the order they're fit
+processes = []
 
+#  name -> CurveForm for every registered form
+forms = {}
+
+
+class CurveForm():
+
+    # a curve form that retention can be fit to:
+    # function(x, *params) is the retention at the days x
+    # guess(x, y) is the initial guess of the params for the retention data x, y (or None to start
+    # from all ones, in which case the number of params is taken from the function's signature)
+    # jacobian(x, *params) is the len(x) x params array of the partial derivatives of the function with
+    # respect to each param (or None to estimate them numerically)
+    # domain is the (lower bounds, upper bounds) of the params (or None for unbounded params), which
+    # is used when the form is fit without bounds of its own
+
+    def __init__(self, name, function, guess=None, jacobian=None, domain=None):
+        self.name = name
+        self.function = function
+        self.guess = guess
+        self.jacobian = jacobian
+        self.domain = domain
+
+    def __repr__(self):
+        return 'CurveForm(' + repr(self.name) + ')'
+
+
+def register_form(name, function, guess=None, jacobian=None, domain=None):
+    # # #  registers a curve form (or replaces the form registered with the same name), which is then
+    # # #  fit along with the others by create_profile and can be chosen as its form
+    if not isinstance(name, str) or name in ['best_fit', 'interpolate', '']:
+        raise Exception('Curve function names must be strings other than best_fit and interpolate')
+    if not callable(function) or (guess is not None and not callable(guess)) or (
+            jacobian is not None and not callable(jacobian)):
+        raise Exception('The function, guess and jacobian of a curve function must be callable')
+
+    if name in forms:
+        # projections of the replaced form are cached under the same name and params
+        projection_cache.cache.clear()
+    else:
+        processes.append(name)
+    forms[name] = CurveForm(name, function, guess, jacobian, domain)
+    return forms[name]
+
+
+def unregister_form(name):
+    if name not in forms:
+        raise Exception(str(name) + ' is not a registered curve function')
+    del forms[name]
+    processes.remove(name)
+    projection_cache.cache.clear()
+
+
+def get_form(name):
+    if name not in forms:
+        raise Exception(str(name) + ' is not a valid retention curve function')
+    return forms[name]
+
+
+def jacobian_columns(x, *columns):
+    # the len(x) x columns jacobian, where each column can be an array over x or a constant
+    jacobian = np.empty(np.shape(x) + (len(columns),))
+    for i, column in enumerate(columns):
+        jacobian[..., i] = column
+    return jacobian
+
+
+# # # # # # # # # # #
+#  kernels
+# # # # # # # # # # #
 
 def log_func(x, a, b, c):
-    np.seterr(all='ignore')
     return -a * np.log2(b + x) + c
 
 
 def exp_func(x, a, b, c):
-    warnings.filterwarnings('ignore')
-    np.seterr(all='ignore')
     return a * np.exp(-b * x) + c
 
 
 def poly_func(x, a, b, c, d):
-    np.seterr(all='ignore')
     return a * x**3 + b * x**2 + c * x + d
 
 
 def linear_func(x, a, b):
-    np.seterr(all='ignore')
     return a * x + b
 
 
 def quad_func(x, a, b, c):
-    np.seterr(all='ignore')
     return a * x**2 + b * x + c
 
 
 def weibull_func(x, k, l):
-    np.seterr(all='ignore')
     return (k/l) * ((x/l) ** (k - 1)) * np.exp(- (x/l) ** k)
 
 
 def power_func(x, a, b):
-    np.seterr(all='ignore')
     return a * x ** -b
 
 
+# # # # # # # # # # #
+#  analytic jacobians of the kernels: the partial derivative of the function with respect to each param
+# # # # # # # # # # #
+
+def log_jacobian(x, a, b, c):
+    x = np.asarray(x, dtype=float)
+    return jacobian_columns(x, -np.log2(b + x), -a / ((b + x) * np.log(2)), 1.0)
+
+
+def exp_jacobian(x, a, b, c):
+    x = np.asarray(x, dtype=float)
+    decay = np.exp(-b * x)
+    return jacobian_columns(x, decay, -a * x * decay, 1.0)
+
+
+def linear_jacobian(x, a, b):
+    x = np.asarray(x, dtype=float)
+    return jacobian_columns(x, x, 1.0)
+
+
+def quad_jacobian(x, a, b, c):
+    x = np.asarray(x, dtype=float)
+    return jacobian_columns(x, x**2, x, 1.0)
+
+
+def weibull_jacobian(x, k, l):
+    x = np.asarray(x, dtype=float)
+    y = weibull_func(x, k, l)
+    scaled = (x/l) ** k
+    return jacobian_columns(x, y * (1 / k + np.log(x/l) * (1 - scaled)), y * k * (scaled - 1) / l)
+
+
+def power_jacobian(x, a, b):
+    x = np.asarray(x, dtype=float)
+    decay = x ** -b
+    return jacobian_columns(x, decay, -a * decay * np.log(x))
+
+
+# # # # # # # # # # #
+#  initial parameter estimates for each curve function, used as the starting point for curve_fit
+#  each one linearizes its function and solves it with a least squares regression
+#  x and y are numpy arrays of the (strictly positive) retention data
+# # # # # # # # # # #
+
+def log_guess(x, y):
+    # with b = 1, y is linear in log2(1 + x)
+    slope, intercept = np.polyfit(np.log2(1 + x), y, 1)
+    return [-slope, 1, intercept]
+
+
+def exp_guess(x, y):
+    # with c = 0, log(y) is linear in x
+    slope, intercept = np.polyfit(x, np.log(y), 1)
+    return [np.exp(intercept), -slope, 0]
+
+
+def linear_guess(x, y):
+    # linear and quad are linear in their parameters, so the regression is the exact fit
+    return np.polyfit(x, y, 1).tolist()
+
+
+def quad_guess(x, y):
+    return np.polyfit(x, y, 2).tolist()
+
+
+def weibull_guess(x, y):
+    # the weibull pdf can't follow a retention curve, so it converges on a sharp peak
+    # through the earliest retention point: with l = x, (k/l) * e^-1 = y
+    first = x == x.min()
+    l = x.min()
+    return [np.e * l * y[first].mean(), l]
+
+
+def power_guess(x, y):
+    # log(y) is linear in log(x)
+    slope, intercept = np.polyfit(np.log(x), np.log(y), 1)
+    return [np.exp(intercept), -slope]
+
+
+register_form('log', log_func, log_guess, log_jacobian)
+register_form('exp', exp_func, exp_guess, exp_jacobian)
+register_form('linear', linear_func, linear_guess, linear_jacobian)
+register_form('quad', quad_func, quad_guess, quad_jacobian)
+register_form('weibull', weibull_func, weibull_guess, weibull_jacobian)
+register_form('power', power_func, power_guess, power_jacobian)
+
+
 def get_interpolation_values(profile):
-    values = {}
-    values['x'] = np.unique(np.array(profile['x'])).tolist()
-    values['y'] = []
+    # the average of the y values at each unique x, weighted by the profile's weights (eg. the size of
+    # the cohort behind each value) if it has them. every value is grouped by its x in one pass
+    x_data = np.asarray(profile['x'])
+    y_data = np.asarray(profile['y'], dtype=float)
+    weights = profile.get('weights')
+    weights = np.ones(len(y_data)) if weights is None else np.asarray(weights, dtype=float)
 
-    for i, v in enumerate(values['x']):
-        # get indices from original X for this value
-        this_y = [profile['y'][i] for i, v2 in enumerate(values['x']) if v2 == v]
-        values['y'].append(round(np.average(this_y), 2))
+    x_unique, x_inverse = np.unique(x_data, return_inverse=True)
+    y_average = np.bincount(x_inverse, weights=weights * y_data) / np.bincount(x_inverse, weights=weights)
+
+    values = {}
+    values['x'] = x_unique.tolist()
+    values['y'] = np.round(y_average, 2).tolist()
 
     # add the collapsed (averaged) values to the profile
     profile['y_collapsed'] = values['y']
@@ -63,6 +221,10 @@ def get_interpolation_values(profile):
 
 
 def interpolate(profile):
+    # scipy.interpolate is only imported once a profile is interpolated
+    from scipy.interpolate import interp1d
+    from scipy.interpolate import InterpolatedUnivariateSpline
+
     interpolation_values = get_interpolation_values(profile)
     profile['interpolation_f'] = interp1d(interpolation_values['x'], interpolation_values['y'])
     profile['interpolation_s'] = InterpolatedUnivariateSpline(interpolation_values['x'], interpolation_values['y'], k=1)
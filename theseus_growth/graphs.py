@@ -9,6 +9,7 @@ from matplotlib import cm
 import numpy as np
 import random
 import math
+from theseus_growth.banded_DAU import BandedForwardDAU
 
 
 def plot_retention(profile, show_average_values=True):
@@ -145,7 +146,11 @@ def stacked_bar(data, series_labels, category_labels=None,
 
 def plot_forward_DAU_stacked(forward_DAU, forward_DAU_labels, forward_DAU_dates, show_values=False,
                              show_totals_values=False):
-    transformed = forward_DAU.values.tolist()
+    if isinstance(forward_DAU, BandedForwardDAU):
+        # a banded projection has to be drawn cell by cell anyway
+        transformed = forward_DAU.to_numpy().tolist()
+    else:
+        transformed = forward_DAU.values.tolist()
 
     # I dont remember what the purpose of this was, but it broke the transformed list when I
     # re-indexed the forward_DAU df to start at 1
@@ -156,9 +161,12 @@ def plot_forward_DAU_stacked(forward_DAU, forward_DAU_labels, forward_DAU_dates,
             transformed[index] = value[1:]
     '''
 
-    totals = [
-        forward_DAU[column].sum() for column in forward_DAU.loc[:, forward_DAU.columns != 'cohort_date']
-    ]
+    if isinstance(forward_DAU, BandedForwardDAU):
+        totals = forward_DAU.totals().tolist()
+    else:
+        totals = [
+            forward_DAU[column].sum() for column in forward_DAU.loc[:, forward_DAU.columns != 'cohort_date']
+        ]
 
     stacked_bar(
         transformed, forward_DAU_labels,
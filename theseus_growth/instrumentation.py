@@ -0,0 +1,204 @@
+# # # #
+#  Instrumentation
+#  Opt-in timing of the stages of fitting and projecting (curve fitting, best fit scoring, retention
+#  projection, cohort building, DAU totals etc.): while an Instrumentation is active, every stage
+#  records its duration, the size of the data it worked on and, optionally, the memory it allocated.
+#  while none is active, a stage is a single check of an empty list
+# # # #
+
+import os
+import json
+import numbers
+import time
+import threading
+import inspect
+import tracemalloc
+from collections.abc import Mapping
+from functools import wraps
+from contextlib import contextmanager
+
+#  the instrumentations that are currently recording
+active = []
+lock = threading.Lock()
+#  the stages that are running while allocations are traced, as [thread, overlapped] pairs: tracemalloc
+#  only counts the memory of the whole process, so the allocations of a stage that overlapped a stage
+#  in another thread can't be told apart from that thread's, and aren't recorded
+running = []
+
+
+class Instrumentation():
+
+    # records the stages run while it's active (used as a context manager). every stage is kept as an
+    # event, and can be summarized per stage with to_dict or exported with to_chrome_trace for
+    # chrome://tracing or Perfetto. callback is called with each event as its stage finishes
+
+    def __init__(self, trace_allocations=False, callback=None):
+        self.trace_allocations = trace_allocations
+        self.callback = callback
+        self.events = []
+        self.started_tracing = False
+
+    def __enter__(self):
+        if self.trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+        with lock:
+            active.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        with lock:
+            active.remove(self)
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+        return False
+
+    def record(self, event):
+        with lock:
+            self.events.append(event)
+        if self.callback is not None:
+            self.callback(event)
+
+    def clear(self):
+        with lock:
+            self.events = []
+
+    def to_dict(self):
+        # the count, total / mean / max duration, total size and total allocations of each stage. the
+        # allocations are None for a stage whose every run overlapped a stage in another thread
+        stages = {}
+        for event in self.events:
+            stage = stages.setdefault(event['name'], {
+                'count': 0, 'total_seconds': 0.0, 'max_seconds': 0.0, 'size': 0, 'allocated_bytes': None
+            })
+            stage['count'] += 1
+            stage['total_seconds'] += event['seconds']
+            stage['max_seconds'] = max(stage['max_seconds'], event['seconds'])
+            stage['size'] += event['size'] or 0
+            if 'allocated_bytes' in event:
+                stage['allocated_bytes'] = (stage['allocated_bytes'] or 0) + event['allocated_bytes']
+
+        for stage in stages.values():
+            stage['mean_seconds'] = stage['total_seconds'] / stage['count']
+            if not self.trace_allocations:
+                del stage['allocated_bytes']
+        return stages
+
+    def to_chrome_trace(self, file_name=None):
+        # the events in the Trace Event Format, as a dict or written to file_name as JSON
+        trace = {
+            'traceEvents': [
+                {
+                    'name': event['name'],
+                    'cat': 'theseus',
+                    'ph': 'X',
+                    'ts': event['start'] * 1e6,
+                    'dur': event['seconds'] * 1e6,
+                    'pid': os.getpid(),
+                    'tid': event['thread'],
+                    'args': {key: value for key, value in event.items()
+                             if key not in ['name', 'start', 'seconds', 'thread']}
+                } for event in self.events
+            ],
+            'displayTimeUnit': 'ms'
+        }
+
+        if file_name is None:
+            return trace
+
+        if not file_name.endswith('.json'):
+            file_name = file_name + '.json'
+        with open(file_name, 'w') as f:
+            json.dump(trace, f, default=str)
+        return None
+
+
+@contextmanager
+def record_stage(name, size=None, **details):
+    # yields the event, so that the stage can add to it (eg. the size of what it built) before it's recorded
+    event = {'name': name, 'size': size, 'thread': threading.get_ident()}
+    event.update(details)
+    allocated = None
+    if tracemalloc.is_tracing():
+        this_stage = [event['thread'], False]
+        with lock:
+            for other_stage in running:
+                if other_stage[0] != this_stage[0]:
+                    other_stage[1] = this_stage[1] = True
+            running.append(this_stage)
+        allocated = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    try:
+        yield event
+    finally:
+        event['seconds'] = time.perf_counter() - start
+        event['start'] = start
+        if allocated is not None:
+            with lock:
+                running.remove(this_stage)
+            if tracemalloc.is_tracing() and not this_stage[1]:
+                # the memory still held once the stage finishes, eg. the arrays it built
+                event['allocated_bytes'] = tracemalloc.get_traced_memory()[0] - allocated
+        for instrumentation in list(active):
+            instrumentation.record(event)
+
+
+class NoStage():
+
+    # the stage used while nothing is being recorded, which does nothing
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NO_STAGE = NoStage()
+
+
+def stage(name, size=None, **details):
+    # # #  marks a stage of the work: with stage('curve_fit', size=len(x), form=form): ...
+    # # #  size is the number of values the stage works on (data points, cells of a matrix etc.)
+    if not active:
+        return NO_STAGE
+    return record_stage(name, size, **details)
+
+
+def get_size(result):
+    # the number of values in what a stage returned (the cells of an array or dataframe, the items of a
+    # list, or the values held by a dict or profile), if it's sized
+    if isinstance(result, tuple):
+        result = result[0]
+    if isinstance(result, Mapping):
+        sizes = [size for size in (get_size(value) for value in result.values()) if size is not None]
+        return sum(sizes) if sizes else None
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, numbers.Number):
+        return 1
+    size = getattr(result, 'size', None)
+    return int(size) if isinstance(size, numbers.Integral) else None
+
+
+def timed(name, details=()):
+    # # #  decorates a function so that each call is recorded as the stage name, with the size of
+    # # #  what it returns. details are the names of arguments to record with it, eg. details=('form',)
+    def decorator(function):
+        signature = inspect.signature(function)
+
+        @wraps(function)
+        def timed_function(*args, **kwargs):
+            if not active:
+                return function(*args, **kwargs)
+
+            arguments = signature.bind(*args, **kwargs).arguments
+            event_details = {detail: arguments.get(detail) for detail in details}
+            with record_stage(name, None, **event_details) as event:
+                result = function(*args, **kwargs)
+                event['size'] = get_size(result)
+            return result
+
+        return timed_function
+    return decorator
@@ -0,0 +1,209 @@
+# # # #
+#  Profile Store
+#  Saves fitted retention profiles in a compact binary format so they can be reloaded without
+#  refitting: the data points, fitted params, errors, best fit and retention projection are
+#  stored as numpy arrays in an .npz archive (no pickling), and profiles are loaded as
+#  RetentionProfiles, which only rebuild the interpolation functions from the data points if they're used
+# # # #
+
+import io
+import os
+import json
+import sqlite3
+import threading
+from collections.abc import MutableMapping
+from urllib.parse import quote, unquote
+import numpy as np
+from theseus_growth import retention_profile
+
+FORMAT_VERSION = 1
+
+
+def profile_to_bytes(profile):
+    arrays = {
+        'x': np.asarray(profile['x'], dtype=float),
+        'y': np.asarray(profile['y'], dtype=float),
+        'projection_x': np.asarray(profile['retention_projection'][0]),
+        'projection_y': np.asarray(profile['retention_projection'][1], dtype=float)
+    }
+    for key in ['weights', 'x_collapsed', 'y_collapsed']:
+        if profile.get(key) is not None:
+            arrays[key] = np.asarray(profile[key], dtype=float)
+    for form, params in profile.get('params', {}).items():
+        arrays['params_' + form] = np.asarray(params, dtype=float)
+    for form, covariance in profile.get('covariances', {}).items():
+        arrays['covariance_' + form] = np.asarray(covariance, dtype=float)
+
+    meta = {
+        'version': FORMAT_VERSION,
+        'best_fit': profile.get('best_fit'),
+        'retention_profile': profile.get('retention_profile'),
+        'errors': {form: float(error) for form, error in profile.get('errors', {}).items()},
+        # whole number data points are restored as ints, like the lists they were provided as
+        'integer_x': all(float(x).is_integer() for x in profile['x'])
+    }
+    arrays['meta'] = np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8)
+
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def profile_from_bytes(data):
+    with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+        meta = json.loads(arrays['meta'].tobytes().decode('utf-8'))
+        if meta['version'] > FORMAT_VERSION:
+            raise Exception('This profile was saved by a newer version of Theseus')
+
+        x = arrays['x']
+        profile = retention_profile.RetentionProfile()
+        profile['x'] = [int(v) for v in x] if meta['integer_x'] else x.tolist()
+        profile['y'] = arrays['y'].tolist()
+        for key in ['weights', 'x_collapsed', 'y_collapsed']:
+            if key in arrays:
+                profile[key] = arrays[key].tolist()
+        if meta['integer_x'] and 'x_collapsed' in profile:
+            profile['x_collapsed'] = [int(v) for v in profile['x_collapsed']]
+
+        profile['params'] = {
+            name[len('params_'):]: arrays[name] for name in arrays.files if name.startswith('params_')
+        }
+        profile['covariances'] = {
+            name[len('covariance_'):]: arrays[name] for name in arrays.files if name.startswith('covariance_')
+        }
+        profile['errors'] = {form: np.float64(error) for form, error in meta['errors'].items()}
+        profile['best_fit'] = meta['best_fit']
+        profile['retention_profile'] = meta['retention_profile']
+        profile['retention_projection'] = (arrays['projection_x'], arrays['projection_y'])
+
+    return profile
+
+
+def save_profile(profile, file_name):
+    if not file_name.endswith('.npz'):
+        file_name = file_name + '.npz'
+
+    write_atomically(file_name, profile_to_bytes(profile))
+    return None
+
+
+def load_profile(file_name):
+    if not file_name.endswith('.npz'):
+        file_name = file_name + '.npz'
+
+    with open(file_name, 'rb') as f:
+        return profile_from_bytes(f.read())
+
+
+def write_atomically(file_name, data):
+    # write to a temporary file and move it into place, so readers never see a partial profile
+    temporary_name = file_name + '.' + str(os.getpid()) + '.' + str(threading.get_ident()) + '.tmp'
+    with open(temporary_name, 'wb') as f:
+        f.write(data)
+    os.replace(temporary_name, file_name)
+
+
+class DirectoryProfileStore(MutableMapping):
+
+    # profiles stored as one .npz file per segment in a directory, accessed like a dict
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def file_name(self, segment):
+        return os.path.join(self.path, quote(str(segment), safe='') + '.npz')
+
+    def __setitem__(self, segment, profile):
+        write_atomically(self.file_name(segment), profile_to_bytes(profile))
+
+    def __getitem__(self, segment):
+        try:
+            with open(self.file_name(segment), 'rb') as f:
+                return profile_from_bytes(f.read())
+        except FileNotFoundError:
+            raise KeyError(segment)
+
+    def __delitem__(self, segment):
+        try:
+            os.remove(self.file_name(segment))
+        except FileNotFoundError:
+            raise KeyError(segment)
+
+    def __contains__(self, segment):
+        return os.path.exists(self.file_name(segment))
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        return sorted(unquote(name[:-len('.npz')]) for name in os.listdir(self.path) if name.endswith('.npz'))
+
+    def close(self):
+        return None
+
+
+class SQLiteProfileStore(MutableMapping):
+
+    # profiles stored in a single SQLite database, one row per segment, accessed like a dict
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS profiles (segment TEXT PRIMARY KEY, profile BLOB)')
+
+    def __setitem__(self, segment, profile):
+        data = profile_to_bytes(profile)
+        with self.lock, self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO profiles (segment, profile) VALUES (?, ?)', (str(segment), data)
+            )
+
+    def __getitem__(self, segment):
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT profile FROM profiles WHERE segment = ?', (str(segment),)
+            ).fetchone()
+        if row is None:
+            raise KeyError(segment)
+        return profile_from_bytes(row[0])
+
+    def __delitem__(self, segment):
+        with self.lock, self.connection:
+            deleted = self.connection.execute('DELETE FROM profiles WHERE segment = ?', (str(segment),)).rowcount
+        if deleted == 0:
+            raise KeyError(segment)
+
+    def __contains__(self, segment):
+        with self.lock:
+            return self.connection.execute(
+                'SELECT 1 FROM profiles WHERE segment = ?', (str(segment),)
+            ).fetchone() is not None
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(*) FROM profiles').fetchone()[0]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        with self.lock:
+            return [row[0] for row in self.connection.execute('SELECT segment FROM profiles ORDER BY segment')]
+
+    def close(self):
+        self.connection.close()
+
+
+def open_profile_store(path, backend='directory'):
+    if backend == 'directory':
+        return DirectoryProfileStore(path)
+    elif backend == 'sqlite':
+        return SQLiteProfileStore(path)
+    else:
+        raise Exception("The profile store backend must be either 'directory' or 'sqlite'")
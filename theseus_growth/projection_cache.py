@@ -0,0 +1,108 @@
+# # # #
+#  Retention Projection Cache
+#  Memoizes retention projections keyed by the fingerprint of the profile that produced them
+#  (its fitted form, that form's params and the projection horizon) so that profiles which are
+#  re-projected over and over, eg. in what-if runs, skip the recomputation
+# # # #
+
+import threading
+from collections import OrderedDict
+import numpy as np
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class ProjectionCache():
+
+    # a least recently used cache of projection arrays, evicted once the arrays
+    # it holds take up more than max_bytes. max_bytes=0 disables the cache
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.projections = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.set_max_bytes(max_bytes)
+
+    def set_max_bytes(self, max_bytes):
+        if not isinstance(max_bytes, int) or max_bytes < 0:
+            raise Exception('The projection cache size must be an integer number of bytes of at least 0')
+
+        with self.lock:
+            self.max_bytes = max_bytes
+            self.evict()
+
+    def get(self, key):
+        with self.lock:
+            projection = self.projections.get(key)
+            if projection is None:
+                self.misses += 1
+                return None
+            self.projections.move_to_end(key)
+            self.hits += 1
+            return projection
+
+    def put(self, key, projection):
+        # the cached array is contiguous float64 and read only, since it's shared by every caller
+        projection = np.array(projection, dtype=np.float64)
+        projection.flags.writeable = False
+
+        with self.lock:
+            if key in self.projections:
+                self.nbytes -= self.projections.pop(key).nbytes
+            if projection.nbytes <= self.max_bytes:
+                self.projections[key] = projection
+                self.nbytes += projection.nbytes
+                self.evict()
+        return projection
+
+    def evict(self):
+        # drop the least recently used projections until the cache fits in max_bytes
+        while self.projections and self.nbytes > self.max_bytes:
+            key, projection = self.projections.popitem(last=False)
+            self.nbytes -= projection.nbytes
+
+    def clear(self):
+        with self.lock:
+            self.projections.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        return {
+            'projections': len(self.projections),
+            'nbytes': self.nbytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+
+def profile_fingerprint(profile, profile_max):
+    # the key that identifies the projection of a profile out to profile_max
+    # returns None if the profile doesn't have a projectable form, in which case it isn't cached
+    form = profile.get('retention_profile')
+    if form == 'best_fit':
+        form = profile.get('best_fit')
+
+    if form == 'interpolate':
+        # an interpolation is defined by the data points it passes through (and how they're weighted)
+        data = (profile['x'], profile['y'])
+        if profile.get('weights') is not None:
+            data = data + (profile['weights'],)
+    elif form in profile.get('params', {}):
+        data = (profile['params'][form],)
+    else:
+        return None
+
+    if profile_max is None:
+        # without a profile_max the projection runs to the last day of the data, so that's its horizon
+        profile_max = max(profile['x'])
+
+    return (form, profile_max) + tuple(np.asarray(values, dtype=np.float64).tobytes() for values in data)
+
+
+# the cache shared by every projection in this process
+cache = ProjectionCache()
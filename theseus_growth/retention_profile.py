@@ -2,15 +2,171 @@
 #  Core Retention Profile Functions
 # # # #
 
+import time
+import warnings
 import numpy as np
-from scipy.optimize import curve_fit
+from collections.abc import MutableMapping
 from itertools import chain
+from functools import partial, wraps
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 ### Import Curve Functions from the package ###
 from theseus_growth import curve_functions
+from theseus_growth import projection_cache
+from theseus_growth import instrumentation
+
+
+class RetentionProfile(MutableMapping):
+
+    # a fitted retention profile. the fields are slots rather than dict entries, and the retention
+    # projection is held as a single contiguous float64 array (shared with the projection cache, so
+    # profiles with the same fit share it), which keeps the memory of each profile small when tens
+    # of thousands of segments are held at once. the profile can still be used like the dict it
+    # replaces: profile['params'], 'covariances' in profile, profile.get('best_fit') etc. work as before,
+    # and profile['retention_projection'] is the (x, y) tuple of days and projected retention.
+    # any other keys stored on the profile (eg. a segment name) are kept in the extra dict
+
+    __slots__ = [
+        'x', 'y', 'weights', 'x_collapsed', 'y_collapsed', 'interpolation_f', 'interpolation_s', 'params',
+        'covariances', 'errors', 'best_fit', 'retention_profile', 'projection', 'evaluator', 'extra'
+    ]
+
+    KEYS = [
+        'x', 'y', 'weights', 'x_collapsed', 'y_collapsed', 'interpolation_f', 'interpolation_s', 'params',
+        'covariances', 'errors', 'best_fit', 'retention_profile', 'retention_projection'
+    ]
+
+    def __init__(self, x=None, y=None, **fields):
+        if x is not None:
+            self.x = x
+        if y is not None:
+            self.y = y
+        for key, value in fields.items():
+            self[key] = value
+
+    def __getitem__(self, key):
+        if key not in self.KEYS:
+            if hasattr(self, 'extra') and key in self.extra:
+                return self.extra[key]
+            raise KeyError(key)
+
+        if key == 'retention_projection':
+            if not hasattr(self, 'projection'):
+                raise KeyError(key)
+            return (np.arange(start=1, stop=len(self.projection) + 1, step=1), self.projection)
+
+        if key in ['interpolation_f', 'interpolation_s'] and not hasattr(self, key) and hasattr(self, 'x'):
+            # the interpolation functions are only built once they're used
+            curve_functions.interpolate(self)
+
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key not in self.KEYS:
+            if not hasattr(self, 'extra'):
+                self.extra = {}
+            self.extra[key] = value
+            return
+
+        if key == 'retention_projection':
+            self.projection = np.ascontiguousarray(value[1], dtype=np.float64)
+        else:
+            setattr(self, key, value)
+
+        if key in ['params', 'best_fit', 'retention_profile', 'x', 'y', 'weights']:
+            # the curve has changed, so it has to be evaluated afresh
+            if hasattr(self, 'evaluator'):
+                del self.evaluator
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        if key not in self.KEYS:
+            del self.extra[key]
+        else:
+            delattr(self, 'projection' if key == 'retention_projection' else key)
+
+    def __contains__(self, key):
+        if key == 'retention_projection':
+            return hasattr(self, 'projection')
+        if key not in self.KEYS:
+            return hasattr(self, 'extra') and key in self.extra
+        return hasattr(self, key)
+
+    def __iter__(self):
+        return chain((key for key in self.KEYS if key in self), getattr(self, 'extra', {}))
+
+    def __len__(self):
+        return sum(1 for key in self)
+
+    def __repr__(self):
+        return 'RetentionProfile(' + ', '.join(
+            key + '=' + repr(self[key]) for key in ['retention_profile', 'best_fit', 'errors'] if key in self
+        ) + ')'
+
+    def __getstate__(self):
+        # the cached evaluator isn't pickled, eg. when profiles come back from a process pool
+        return {key: getattr(self, key) for key in self.__slots__ if key != 'evaluator' and hasattr(self, key)}
+
+    def __setstate__(self, state):
+        for key, value in state.items():
+            setattr(self, key, value)
+
+    def get_form(self):
+        form = self.retention_profile
+        if form == 'best_fit':
+            form = self.best_fit
+        return form
+
+    def evaluate(self, x):
+        # the profile's retention curve at x (any day, not just those in the projection), using the
+        # fitted function or the interpolation. the function is looked up once and then cached
+        if not hasattr(self, 'evaluator'):
+            form = self.get_form()
+            if form == 'interpolate':
+                self.evaluator = self['interpolation_s']
+            else:
+                function = curve_functions.get_form(form).function
+                params = self.params[form]
+                self.evaluator = lambda x: function(x, *params)
+        with np.errstate(all='ignore'):
+            return self.evaluator(x)
+
+    def retention(self, ages):
+        # the projected retention at integer ages (in days, where day 0 is 100),
+        # read straight from the projection: any age past the end of the projection retains no one
+        ages = np.asarray(ages)
+        in_projection = (ages >= 0) & (ages < len(self.projection))
+        return np.where(in_projection, self.projection[np.where(in_projection, ages, 0)], 0.0)
+
+
+def get_projection(profile, profile_max):
+    # the retention projection of the profile out to profile_max as a read only float64 array
+    # projections are memoized by the profile's fitted form, params and horizon
+    fingerprint = projection_cache.profile_fingerprint(profile, profile_max)
+    if fingerprint is not None:
+        y_data_projected = projection_cache.cache.get(fingerprint)
+        if y_data_projected is not None:
+            return y_data_projected
+
+    x_data_projected, y_data_projected = build_retention_profile(profile, profile_max)
+
+    if fingerprint is not None:
+        return projection_cache.cache.put(fingerprint, y_data_projected)
+    return np.array(y_data_projected, dtype=np.float64)
 
 
 def generate_retention_profile(profile, profile_max):
+    y_data_projected = get_projection(profile, profile_max)
+    x_data_projected = np.arange(start=1, stop=len(y_data_projected) + 1, step=1)
+    return (x_data_projected, list(y_data_projected))
+
+
+@instrumentation.timed('retention_projection')
+def build_retention_profile(profile, profile_max):
     y_data_projected = project_retention(profile, profile_max=profile_max)
     # push 1 onto the front of the list because day 0 retention is always 100
     y_data_projected = np.insert(y_data_projected, 0, 100)
@@ -54,6 +210,8 @@ def project_retention(profile, profile_max=None, start=None, stop=None):
         raise Exception('Incorrect parameter set sent. Must include either profile_max or start and end points.')
 
     this_process = profile['retention_profile']
+    if this_process == 'best_fit' and profile['best_fit'] == 'interpolate':
+        this_process = 'interpolate'
 
     #
     #  we have a process equation for the function, so now use that to project
@@ -63,13 +221,10 @@ def project_retention(profile, profile_max=None, start=None, stop=None):
         #  if the process isn't simply to just interpolate the points
         if this_process == 'best_fit':
             this_process = profile['best_fit']
-        # get the retention projection for the appropriate process
-        if this_process in curve_functions.processes:
-            retention_projection = getattr(
-                curve_functions, this_process + '_func'
-                )(x2, *profile['params'][this_process])
-        else:
-            raise Exception('Invalid retention function provided: ' + this_process)
+        # get the retention projection for the appropriate process (get_form rejects unknown processes)
+        form = curve_functions.get_form(this_process)
+        with np.errstate(all='ignore'):
+            retention_projection = form.function(x2, *profile['params'][this_process])
     else:
         #  create the retention projection for the interpolation
         if profile_max is None:
@@ -90,81 +245,419 @@ def project_retention(profile, profile_max=None, start=None, stop=None):
     return retention_projection
 
 
-def generate_curve_coefficients(profile, process_value):
+def get_initial_guess(profile, process_value, warm_start=None):
+    # the starting parameters for fitting process_value to the profile
+    # a previously fitted profile's params for this form are used if they're available (a warm start),
+    # otherwise the analytic estimate for the form is used (if the form has one)
+    # it's called while fitting, when warnings are already suppressed (see generate_curve_coefficients)
+    if warm_start is not None and warm_start.get('params', {}).get(process_value) is not None:
+        return list(warm_start['params'][process_value])
+
+    form = curve_functions.get_form(process_value)
+    if form.guess is None:
+        return None
+
+    x_data = np.asarray(profile['x'], dtype=float)
+    y_data = np.asarray(profile['y'], dtype=float)
+    try:
+        with np.errstate(all='ignore'):
+            p0 = form.guess(x_data, y_data)
+            y_guess = form.function(x_data, *p0)
+    except Exception:
+        return None
+    # a guess that overflows somewhere along the curve gives the solver nothing to work with
+    if not np.all(np.isfinite(p0)) or not np.all(np.isfinite(y_guess)):
+        return None
+    return p0
+
+
+def with_deadline(function, deadline):
+    # the curve function, which stops the fit it's used in (by raising) once deadline has passed
+    # (it keeps the function's signature, which curve_fit counts the params from)
+    @wraps(function)
+    def function_with_deadline(x, *params):
+        if time.perf_counter() > deadline:
+            raise Exception('The fit ran out of time')
+        return function(x, *params)
+    return function_with_deadline
+
+
+def generate_curve_coefficients(profile, process_value, bounds=None, warm_start=None, full_output=False,
+                                timeout=None, maxfev=None):
+    # the params of process_value fitted to the profile (see fit_curve_coefficients), with the solver's
+    # warnings suppressed (eg. when it can't estimate the covariance of the params)
+    # warnings.catch_warnings isn't thread safe, so the threads of a parallel fit call fit_curve_coefficients
+    # directly, all inside a single catch_warnings in the thread that started them
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return fit_curve_coefficients(profile, process_value, bounds, warm_start, full_output, timeout, maxfev)
+
+
+@instrumentation.timed('curve_fit', details=('process_value',))
+def fit_curve_coefficients(profile, process_value, bounds=None, warm_start=None, full_output=False,
+                           timeout=None, maxfev=None):
+    # bounds is an optional dict of process value -> (lower bounds, upper bounds) for that form's parameters
+    # warm_start is an optional previously fitted profile whose params are used as the initial guesses
+    # with full_output, the estimated covariance of the params is returned along with them: (popt, pcov)
+    # timeout is the optional number of seconds the form can be fit for, and maxfev the optional maximum
+    # number of times the curve function is evaluated while fitting it: a form that runs over either
+    # isn't fit, like a form that doesn't converge
     if process_value in curve_functions.processes:
+        # scipy.optimize is only imported once a curve is fitted, so loading and projecting
+        # stored profiles doesn't pay for it
+        from scipy.optimize import curve_fit
+
         x_data = profile['x']
         y_data = profile['y']
-        this_func = process_value + '_func'
-        try:
-            popt, pcov = curve_fit(getattr(curve_functions, this_func), x_data, y_data)
-        except Exception:
-            # raise Exception('Unable to process retention curve with ' + process_value + ' function')
-            print('Notice: Unable to process retention curve with ' + process_value + ' function')
-            return None
-        popt, pcov = curve_fit(getattr(curve_functions, this_func), x_data, y_data)
+        form = curve_functions.get_form(process_value)
+        this_func = form.function
+        # the analytic jacobian (if the form has one) saves the solver estimating it numerically
+        this_jacobian = form.jacobian
+        this_bounds = (-np.inf, np.inf) if form.domain is None else form.domain
+        if bounds is not None and process_value in bounds:
+            this_bounds = bounds[process_value]
+        # like curve_fit, the form is only bounded if some bound is finite (the bounds can be scalars,
+        # lists or arrays, so they're compared as arrays)
+        bounded = bool(np.any(np.asarray(this_bounds[0], dtype=float) > -np.inf)
+                       or np.any(np.asarray(this_bounds[1], dtype=float) < np.inf))
+
+        deadline = None
+        if timeout is not None:
+            deadline = time.perf_counter() + timeout
+            this_func = with_deadline(this_func, deadline)
+
+        # the limit on evaluations is named differently by the unbounded (lm) and bounded (trf) solvers
+        limits = {}
+        if maxfev is not None:
+            limits = {'max_nfev': maxfev} if bounded else {'maxfev': maxfev}
+
+        # weighted values are fitted with errors inversely proportional to the square root of their weight,
+        # like the standard error of retention measured on a cohort of that size
+        sigma = None
+        if profile.get('weights') is not None:
+            sigma = 1 / np.sqrt(np.asarray(profile['weights'], dtype=float))
+
+        p0 = get_initial_guess(profile, process_value, warm_start)
+        if p0 is not None and bounded:
+            # the initial guess has to lie within the bounds
+            p0 = np.clip(p0, this_bounds[0], this_bounds[1]).tolist()
+
+        # the solver will try params that overflow the curve
+        with np.errstate(all='ignore'):
+            try:
+                popt, pcov = curve_fit(
+                    this_func, x_data, y_data, p0=p0, sigma=sigma, bounds=this_bounds, jac=this_jacobian, **limits
+                )
+            except Exception:
+                if p0 is None or (deadline is not None and time.perf_counter() > deadline):
+                    # raise Exception('Unable to process retention curve with ' + process_value + ' function')
+                    print('Notice: Unable to process retention curve with ' + process_value + ' function')
+                    return (None, None) if full_output else None
+                # the initial guess led the solver astray, so start over from curve_fit's default
+                try:
+                    popt, pcov = curve_fit(
+                        this_func, x_data, y_data, sigma=sigma, bounds=this_bounds, jac=this_jacobian, **limits
+                    )
+                except Exception:
+                    print('Notice: Unable to process retention curve with ' + process_value + ' function')
+                    return (None, None) if full_output else None
     elif process_value == 'interpolate':
         curve_functions.interpolate(profile)
-        return None
+        return (None, None) if full_output else None
     else:
         raise Exception(process_value + ' is not a valid retention curve function')
-    return popt
+    return (popt, pcov) if full_output else popt
 
 
-def process_retention_profile_projection(profile):
+def process_retention_profile_projection(profile, bounds=None, warm_start=None, parallel=None, timeout=None,
+                                         maxfev=None):
+    # returns the params of every form that could be fitted, and keeps the covariance
+    # of those params in the profile's covariances dict
+    # parallel fits the curve forms at the same time in a pool of threads ('thread') or processes ('process'),
+    # one for each form, rather than one after the other
     curve_fit_values = {}
+    profile['covariances'] = {}
     process_list = curve_functions.processes.copy() + ['interpolate']
 
-    for process_value in process_list:
-        curve_fit_values[process_value] = generate_curve_coefficients(profile, process_value)
-        if curve_fit_values[process_value] is None:
-            # couldn't fit a curve for this form so delete it from the process list
-            if process_value in curve_fit_values:
-                del curve_fit_values[process_value]
+    if parallel not in [None, 'thread', 'process']:
+        raise Exception("parallel must be None, 'thread' or 'process'")
+
+    # the warnings are suppressed here, once, so that the threads of a parallel fit don't each change
+    # the (process wide) warning filters at the same time. each process of a process pool suppresses its own
+    fit = partial(
+        generate_curve_coefficients if parallel == 'process' else fit_curve_coefficients, profile,
+        bounds=bounds, warm_start=warm_start, full_output=True, timeout=timeout, maxfev=maxfev
+    )
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        if parallel is None:
+            results = [fit(process_value) for process_value in process_list]
+        else:
+            pool = ThreadPoolExecutor if parallel == 'thread' else ProcessPoolExecutor
+            # the interpolation is built on the profile itself, so it's done here rather than in the pool
+            with pool(max_workers=len(curve_functions.processes)) as executor:
+                results = list(executor.map(fit, curve_functions.processes)) + [fit('interpolate')]
+
+    for process_value, (params, covariance) in zip(process_list, results):
+        if params is not None:
+            # forms that couldn't be fitted are left out
+            curve_fit_values[process_value] = params
+            profile['covariances'][process_value] = covariance
     return curve_fit_values
 
 
-def get_retention_projection_best_fit(profile, profile_max=None):
-    equations = {}
+@instrumentation.timed('best_fit_scoring')
+def score_fits(profile, x_data, y_data, profile_max):
+    # the summed squared error of every fitted form against the data points
     errors = {}
 
+    # only the data points whose x value is a whole number in [0, profile_max) are scored,
+    # the same set of x values that the curves are projected against
+    x_data = np.asarray(x_data, dtype=float)
+    y_data = np.asarray(y_data, dtype=float)
+    scored = (x_data == np.floor(x_data)) & (x_data >= 0) & (x_data < profile_max)
+    # group the data points by x value so each curve is only evaluated once per unique x
+    x_unique, x_inverse = np.unique(x_data[scored], return_inverse=True)
+
+    fitted = [process_value for process_value in curve_functions.processes if process_value in profile['params']]
+    if fitted:
+        # the projected value of every fitted curve at each unique x: forms x unique x values
+        with np.errstate(all='ignore'):
+            equations = np.array([
+                curve_functions.get_form(process_value).function(x_unique, *profile['params'][process_value])
+                for process_value in fitted
+            ], dtype=float).reshape(len(fitted), len(x_unique))
+        # the summed squared error between every data point and its projected value, for all forms at once
+        squares = (equations[:, x_inverse] - y_data[scored]) ** 2
+        if profile.get('weights') is not None:
+            # each squared error counts in proportion to its weight (relative to the average weight)
+            weights = np.asarray(profile['weights'], dtype=float)[scored]
+            squares = squares * (weights / weights.mean())
+        summed_squares = np.sum(squares, axis=1)
+        errors = dict(zip(fitted, summed_squares))
+
+    return errors
+
+
+def get_retention_projection_best_fit(profile, profile_max=None, bounds=None, warm_start=None, parallel=None,
+                                      timeout=None, maxfev=None, form='best_fit'):
+    # form is the form the profile will be projected with: if it's the interpolation, the best fit is
+    # only informational, so it isn't an issue if no curve function could be fitted
     x_data = profile['x']
     y_data = profile['y']
 
     if profile_max is None:
         profile_max = max(x_data)
 
-    x2 = np.arange(profile_max)
-
     if 'params' not in profile or not profile['params']:
-        profile['params'] = process_retention_profile_projection(profile)
-
-    for process_value in curve_functions.processes:
-        if process_value in profile['params']:
-            this_func = process_value + '_func'
-            this_params = profile['params'][process_value]
-            equations[process_value] = getattr(curve_functions, this_func)(x2, *this_params)
-            # calculate the summed squared error for this model based on the X values
-            # that exist for this retention profile
-            these_summed_squares = 0
-
-            for i, x_projection in enumerate(x2):
-                x_projection = int(x_projection)
-                # loop through x2 and get all the y values for that x
-                # since there can be multiple points per x value
-                # the indices in x_data are the same for those values in y_data
-                x_indices = [i for i, x in enumerate(x_data) if x == x_projection]
-                y_values = [y_data[index] for index in x_indices]
-                # get the projected value for this x value from equations
-                projected_value = equations[process_value][x_projection]
-                # sum up squared errors between all y values and the projected value
-                this_ss = sum([abs(projected_value - this_value)**2 for this_value in y_values])
-                # add the summed errors for the y values at this x value to the running total
-                these_summed_squares += this_ss
-            # assign the summed squares value to the errors for this process value
-            errors[process_value] = these_summed_squares
-
-    best_fit = str(min(errors, key=errors.get))
+        profile['params'] = process_retention_profile_projection(
+            profile, bounds, warm_start, parallel, timeout, maxfev
+        )
+
+    errors = score_fits(profile, x_data, y_data, profile_max)
+
+    if errors:
+        best_fit = str(min(errors, key=errors.get))
+    else:
+        # no curve function could be fitted (eg. they all ran over the timeout or maxfev),
+        # but the points can always be interpolated
+        if form != 'interpolate':
+            print('Notice: No retention curve function could be fitted, so the best fit is the interpolation')
+        best_fit = 'interpolate'
     profile['errors'] = errors
     profile['best_fit'] = best_fit
 
     return profile
+
+
+def test_retention_profile(x_data, y_data):
+    # the data is checked as arrays, so checking many data points is cheap
+    # do both lists have the same number of elements?
+    if len(x_data) != len(y_data):
+        raise Exception('X and Y have differing numbers of data points')
+    x_array = np.asarray(x_data)
+    y_array = np.asarray(y_data)
+    if x_array.ndim != 1 or x_array.dtype.kind not in 'iuf':
+        raise Exception('X data can only contain integers')
+    if y_array.ndim != 1 or y_array.dtype.kind not in 'iuf':
+        raise Exception('Y data can only contain integers and floats')
+    if not np.all((y_array <= 100) & (y_array > 0)):
+        raise Exception('Y data must be less than or equal to 100 and more than 0')
+    if not np.all(x_array > 0):
+        raise Exception('X data must be more than 0')
+    if x_data is None or y_data is None or len(x_data) < 2 or len(y_data) < 2:
+        raise Exception('Insufficient retention data provided!')
+
+    return True
+
+
+def test_weights(x_data, weights):
+    weights = np.asarray(weights, dtype=float)
+    if weights.shape != (len(x_data),):
+        raise Exception('There must be one weight for each retention value')
+    if not np.all(np.isfinite(weights)) or not np.all(weights > 0):
+        raise Exception('Weights must be more than 0')
+
+    return True
+
+
+@instrumentation.timed('create_profile')
+def create_profile(days, retention_values, form='best_fit', profile_max=None, bounds=None, warm_start=None,
+                   weights=None, parallel=None, timeout=None, maxfev=None):
+
+    if test_retention_profile(days, retention_values):
+        profile = RetentionProfile(days, retention_values)
+
+    if weights is not None:
+        test_weights(days, weights)
+        profile['weights'] = weights
+
+    if profile_max is not None and (not isinstance(profile_max, int) or profile_max < max(days)):
+        raise Exception("profile_max must be an integer greater than or equal to maximum value of Days data")
+
+    #  build the params attribute, which contains profile function curve shape parameters
+    #  if the best fit function is requested, use teh get_retention_projection_best_fit method
+    #  which iterates through all curve functions and finds the best fit (least squared error)
+    #  if a single form was provided, just get that
+    #  bounds optionally constrains the parameters of each form and warm_start is an optional
+    #  previously fitted profile (eg. yesterday's fit of this segment) whose params seed the fitting
+    #  weights are optional weights for each retention value (eg. the size of the cohort it was measured
+    #  on), so that values from bigger cohorts count for more in the fit, the scoring and the interpolation
+    #  parallel ('thread' or 'process') fits the forms at the same time rather than one by one, and timeout
+    #  (seconds) and maxfev (curve function evaluations) cap the fitting of each form, so that a form that
+    #  struggles with the data is given up on rather than holding up the rest
+    profile = get_retention_projection_best_fit(
+        profile, profile_max, bounds, warm_start, parallel, timeout, maxfev, form
+    )
+    if form == 'best_fit' or form == '' or form is None:
+        profile['retention_profile'] = 'best_fit'
+    else:
+        if form in curve_functions.processes or form == 'interpolate':
+            profile['retention_profile'] = form
+        else:
+            raise Exception('Invalid retention curve function provided')
+
+    profile.projection = get_projection(profile, profile_max)
+    return profile
+
+
+@instrumentation.timed('retention_projection_tail')
+def project_interpolation_tail(profile, updated, first_day, profile_max):
+    # the projection of the interpolated profile updated, which is profile with data points added after
+    # first_day: the interpolation only changes after the last data point before first_day, so the
+    # projection up to that point is kept and only the rest of it is projected again
+    previous_projection = profile['retention_projection'][1]
+    min_x = min(updated['x'])
+    earlier_x = [x for x in np.unique(profile['x']) if x < first_day]
+    if not earlier_x or min(profile['x']) != min_x or len(previous_projection) != profile_max:
+        return None
+
+    # the projection holds 100 for day 0 and then the interpolation from min_x onwards
+    kept = int(max(earlier_x)) - min_x + 2
+    tail_x = np.arange(start=min_x + kept - 1, stop=min_x + profile_max - 1, step=1)
+    tail = np.maximum(updated['interpolation_s'](tail_x), 0)
+    return np.concatenate([previous_projection[:kept], tail])
+
+
+@instrumentation.timed('update_profile')
+def update_profile(profile, new_days, new_values, new_weights=None, profile_max=None, bounds=None):
+    # # #  returns the profile refit with new retention values (eg. the days that have matured since it was
+    # # #  fit) added to its data. every form is fit starting from the profile's params, which are usually
+    # # #  close to the new fit, and an interpolated profile only projects the days after its last data
+    # # #  point before the new ones again. the profile passed in isn't changed.
+    # # #  new_weights are required if the profile was fit with weights, and not allowed if it wasn't.
+    # # #  profile_max defaults to the profile's current horizon (or the last new day, if that's later)
+
+    days = list(profile['x']) + list(new_days)
+    retention_values = list(profile['y']) + list(new_values)
+    test_retention_profile(days, retention_values)
+
+    weights = profile.get('weights')
+    if weights is None and new_weights is not None:
+        raise Exception('The profile was fit without weights, so new_weights cannot be provided')
+    if weights is not None:
+        if new_weights is None:
+            raise Exception('The profile was fit with weights, so new_weights must be provided')
+        weights = list(weights) + list(new_weights)
+        test_weights(days, weights)
+
+    if profile_max is None:
+        profile_max = int(max(len(profile['retention_projection'][1]), max(days)))
+    elif not isinstance(profile_max, int) or profile_max < max(days):
+        raise Exception("profile_max must be an integer greater than or equal to maximum value of Days data")
+
+    updated = RetentionProfile(days, retention_values)
+    if weights is not None:
+        updated['weights'] = weights
+
+    updated = get_retention_projection_best_fit(
+        updated, profile_max, bounds, warm_start=profile, form=profile['retention_profile']
+    )
+    updated['retention_profile'] = profile['retention_profile']
+
+    projection = None
+    if updated['retention_profile'] == 'interpolate':
+        fingerprint = projection_cache.profile_fingerprint(updated, profile_max)
+        projection = projection_cache.cache.get(fingerprint)
+        if projection is None and len(new_days) > 0:
+            projection = project_interpolation_tail(profile, updated, min(new_days), profile_max)
+            if projection is not None:
+                projection = projection_cache.cache.put(fingerprint, projection)
+
+    # a fitted curve changes everywhere once its params move, so it's projected again in full
+    # (if they haven't moved, the projection comes straight from the projection cache)
+    updated.projection = get_projection(updated, profile_max) if projection is None else projection
+    return updated
+
+
+def create_segment_profile(segment_data, form='best_fit', profile_max=None, bounds=None):
+    # fits the profile for a single segment of a batch; segment_data is
+    # (days, retention_values, weights, warm_start)
+    # any failure is returned alongside the profile rather than raised
+    # so that one bad segment doesn't abort the rest of the batch
+    days, retention_values, weights, warm_start = segment_data
+    try:
+        return create_profile(days, retention_values, form, profile_max, bounds, warm_start, weights), None
+    except Exception as e:
+        return None, e
+
+
+def create_profiles(segments, form='best_fit', profile_max=None, max_workers=None, chunksize=1,
+                    bounds=None, warm_starts=None):
+    # # #  fits a retention profile for every segment in segments, which is a mapping of
+    # # #  segment -> (days, retention_values) or (days, retention_values, weights), fanning the fitting out
+    # # #  across a process pool.
+    # # #  returns a dict of segment -> profile in the same order as segments and a dict of
+    # # #  segment -> exception for every segment that couldn't be fit (those are left out of the profiles)
+    # # #  max_workers=1 fits every segment in this process without starting a pool
+    # # #  warm_starts is an optional mapping of segment -> previously fitted profile for that segment
+
+    if max_workers is not None and (not isinstance(max_workers, int) or max_workers < 1):
+        raise Exception('max_workers must be an integer greater than 0')
+
+    if warm_starts is None:
+        warm_starts = {}
+
+    segment_names = list(segments.keys())
+    segment_data = [
+        tuple(segments[segment][:2])
+        + (segments[segment][2] if len(segments[segment]) > 2 else None, warm_starts.get(segment))
+        for segment in segment_names
+    ]
+    fit = partial(create_segment_profile, form=form, profile_max=profile_max, bounds=bounds)
+
+    if max_workers == 1:
+        results = [fit(data) for data in segment_data]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(fit, segment_data, chunksize=chunksize))
+
+    profiles = {}
+    failures = {}
+    for segment, (profile, failure) in zip(segment_names, results):
+        if failure is None:
+            profiles[segment] = profile
+        else:
+            failures[segment] = failure
+
+    return profiles, failures
@@ -0,0 +1,101 @@
+# # # #
+#  Retention Tables
+#  Fits retention profiles straight from cohort-level retention tables, with a row per cohort and day:
+#  (install_date, day_n, installs, retained), as a pandas dataframe or an Arrow table. the rows are
+#  aggregated to the retention on each day across every cohort, weighted by the installs behind it,
+#  so that the fit trusts days measured on more users more
+# # # #
+
+import numpy as np
+import pandas as pd
+from theseus_growth import retention_profile
+
+
+def to_dataframe(table, columns):
+    # only the columns that are needed are taken from the table; an Arrow table is converted
+    # to a dataframe without importing pyarrow here
+    missing = [c for c in columns if c not in list(getattr(table, 'column_names', None) or table.columns)]
+    if missing:
+        raise Exception('The retention table has no ' + ', '.join(missing) + ' column')
+
+    if isinstance(table, pd.DataFrame):
+        return table[columns]
+    if hasattr(table, 'select') and hasattr(table, 'to_pandas'):
+        return table.select(columns).to_pandas()
+    raise Exception('The retention table must be a pandas DataFrame or an Arrow table')
+
+
+def test_retention_table(rows, day_column, installs_column, retained_column):
+    # every row is checked at once as arrays
+    for column in [day_column, installs_column, retained_column]:
+        values = rows[column].to_numpy()
+        if values.dtype.kind not in 'iuf' or np.isnan(values.astype(float)).any():
+            raise Exception('The ' + column + ' column must only contain numbers')
+
+    days = rows[day_column].to_numpy()
+    installs = rows[installs_column].to_numpy()
+    retained = rows[retained_column].to_numpy()
+    if not np.all(days == np.floor(days)) or not np.all(days >= 0):
+        raise Exception('The ' + day_column + ' column must only contain whole numbers of days of 0 or more')
+    if not np.all(installs > 0):
+        raise Exception('The ' + installs_column + ' column must be more than 0')
+    if not np.all((retained >= 0) & (retained <= installs)):
+        raise Exception('The ' + retained_column + ' column must be between 0 and the number of installs')
+
+    return True
+
+
+def aggregate_retention_table(table, segment_column=None, day_column='day_n', installs_column='installs',
+                              retained_column='retained'):
+    # # #  aggregates a cohort-level retention table to the retention on each day: the users retained on
+    # # #  that day by every cohort as a percentage of those cohorts' installs. returns (days, retention_values,
+    # # #  weights) where the weights are the installs behind each day's retention, or with a segment_column,
+    # # #  a dict of segment -> (days, retention_values, weights) like the segments of create_profiles.
+    # # #  day 0 rows are left out, since day 0 retention is always 100, and so are days on which no users
+    # # #  were retained by any cohort, since retention curves are only fit to retention of more than 0
+
+    columns = [day_column, installs_column, retained_column]
+    if segment_column is not None:
+        columns = [segment_column] + columns
+    rows = to_dataframe(table, columns)
+
+    test_retention_table(rows, day_column, installs_column, retained_column)
+    rows = rows[rows[day_column].to_numpy() > 0]
+
+    keys = [day_column] if segment_column is None else [segment_column, day_column]
+    totals = rows.groupby(keys, sort=True)[[installs_column, retained_column]].sum()
+    totals = totals[totals[retained_column].to_numpy() > 0]
+
+    days = totals.index.get_level_values(day_column).to_numpy().astype(np.int64)
+    installs = totals[installs_column].to_numpy().astype(float)
+    retention_values = 100 * totals[retained_column].to_numpy() / installs
+
+    if segment_column is None:
+        return days.tolist(), retention_values.tolist(), installs.tolist()
+
+    # the aggregated rows are sorted by segment, so each segment is one contiguous slice of them
+    segments = totals.index.get_level_values(segment_column)
+    segment_names, starts = np.unique(segments.to_numpy(), return_index=True)
+    ends = np.append(starts[1:], len(segments))
+    return {
+        segment: (
+            days[start:end].tolist(), retention_values[start:end].tolist(), installs[start:end].tolist()
+        ) for segment, start, end in zip(segment_names.tolist(), starts, ends)
+    }
+
+
+def create_profile_from_table(table, form='best_fit', profile_max=None, bounds=None, warm_start=None,
+                              day_column='day_n', installs_column='installs', retained_column='retained'):
+    days, retention_values, weights = aggregate_retention_table(
+        table, None, day_column, installs_column, retained_column
+    )
+    return retention_profile.create_profile(days, retention_values, form, profile_max, bounds, warm_start, weights)
+
+
+def create_profiles_from_table(table, segment_column, form='best_fit', profile_max=None, max_workers=None,
+                               chunksize=1, bounds=None, warm_starts=None, day_column='day_n',
+                               installs_column='installs', retained_column='retained'):
+    segments = aggregate_retention_table(table, segment_column, day_column, installs_column, retained_column)
+    return retention_profile.create_profiles(
+        segments, form, profile_max, max_workers, chunksize, bounds, warm_starts
+    )
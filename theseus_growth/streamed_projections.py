@@ -0,0 +1,104 @@
+# # # #
+#  Streamed Projections
+#  Projects DAU, DNU and aged DAU a chunk of dates at a time rather than building the whole
+#  cohorts x dates forward DAU projection, so memory stays flat however long the projection is:
+#  a cohort only has DAU until its retention drops to 0, so each chunk of dates only needs the
+#  window of cohorts acquired within one retention horizon of it
+# # # #
+
+import numpy as np
+import pandas as pd
+from theseus_growth import cohort_projections
+
+
+def build_chunk(values, row_label, index_name, dates):
+    return pd.DataFrame([values], index=pd.Index([row_label], name=index_name), columns=dates)
+
+
+def stream_cohorted_DAU(profile, periods, cohorts, ages=None, chunk_size=365, DAU_target=None,
+                        DAU_target_timeline=None, start_date=1):
+    # # #  returns a generator that yields the projection of cohorts chunk_size dates at a time, on the
+    # # #  same dates as project_cohorted_DAU. each chunk is a dict of dataframes with those dates as columns:
+    # # #  'DAU' (total DAU, like DAU_total), 'DNU' (the size of the cohort acquired on each date) and,
+    # # #  if ages are provided, 'aged_DAU' and 'exact_aged_DAU' (the DAU that is at least / exactly each
+    # # #  age on each date, where users are 1 day old on the day they're acquired).
+    # # #  with a DAU_target, the cohorts needed to hit the target are streamed along with cohorts.
+    # # #  the parameters are checked when it's called, rather than when the first chunk is requested
+
+    if not isinstance(periods, int) or periods < 2:
+        raise Exception("The periods parameter must be an integer greater than 1")
+
+    if len(cohorts) < 1 or not all(isinstance(x, int) for x in cohorts) or not all(x >= 1 for x in cohorts):
+        raise Exception("Must provide at least one cohort value, and all cohort values must be greater than 0")
+
+    if not isinstance(chunk_size, int) or chunk_size < 1:
+        raise Exception("The chunk_size parameter must be an integer greater than 0")
+
+    if ages is not None and (len(ages) == 0 or any(x <= 0 for x in ages)):
+        raise Exception("Age values cannot be empty or less than 1")
+
+    if ages is not None:
+        # remove any ages that are > the number of periods being projected out
+        ages = [age for age in ages if age <= periods]
+
+    if DAU_target is not None and DAU_target_timeline is not None and DAU_target_timeline > periods:
+        raise Exception("DAU target timeline is longer than the number of periods being projected")
+
+    if start_date == 0 or start_date is None:
+        start_date = 1
+    offset = 0 if start_date == 1 else 1
+    date_count = periods + offset
+
+    if DAU_target is not None:
+        cohorts = cohort_projections.project_targeted_DNU(
+            profile, periods, cohorts, DAU_target, DAU_target_timeline, start_date
+        )
+    cohorts = np.asarray(cohorts, dtype=float)
+
+    # the retention vector only needs to run until it retains no one: that's the horizon
+    # that the window of cohorts has to cover
+    retention = cohort_projections.get_retention_vector(profile, periods)
+    nonzero = np.flatnonzero(retention)
+    horizon = nonzero[-1] + 1 if len(nonzero) else 1
+    retention = retention[:horizon]
+
+    return generate_chunks(retention, horizon, cohorts, ages, chunk_size, start_date, offset, date_count)
+
+
+def generate_chunks(retention, horizon, cohorts, ages, chunk_size, start_date, offset, date_count):
+    for first_date in range(0, date_count, chunk_size):
+        last_date = min(first_date + chunk_size, date_count)
+        date_index = np.arange(first_date, last_date)
+        dates = [str(start_date + d) for d in date_index]
+
+        # the cohorts that have any DAU in this chunk: acquired (on date index cohort + offset)
+        # no more than one horizon before the chunk starts, and before it ends
+        first_cohort = min(max(first_date - offset - horizon + 1, 0), len(cohorts))
+        last_cohort = min(max(last_date - offset, 0), len(cohorts))
+        window = np.arange(first_cohort, last_cohort)
+
+        # the age (in days since acquisition) of each cohort in the window on each date in the chunk
+        cohort_ages = date_index[np.newaxis, :] - (window[:, np.newaxis] + offset)
+        active = (cohort_ages >= 0) & (cohort_ages < horizon)
+        DAU = np.where(
+            active,
+            np.trunc(cohorts[window, np.newaxis] * retention[np.clip(cohort_ages, 0, horizon - 1)] / 100),
+            0
+        ).astype(np.int64)
+
+        chunk = {
+            'DAU': build_chunk(DAU.sum(axis=0), 'DAU', 'Value', dates),
+            'DNU': build_chunk(np.where(cohort_ages == 0, DAU, 0).sum(axis=0), 'DNU', 'Value', dates)
+        }
+
+        if ages is not None:
+            chunk['aged_DAU'] = pd.DataFrame(
+                [np.where(cohort_ages >= age - 1, DAU, 0).sum(axis=0) for age in ages],
+                index=pd.Index(ages, name='age'), columns=dates
+            )
+            chunk['exact_aged_DAU'] = pd.DataFrame(
+                [np.where(cohort_ages == age - 1, DAU, 0).sum(axis=0) for age in ages],
+                index=pd.Index(ages, name='age'), columns=dates
+            )
+
+        yield chunk
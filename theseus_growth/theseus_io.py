@@ -1,3 +1,11 @@
+import os
+import json
+import time
+import uuid
+from urllib.parse import quote, unquote
+import numpy as np
+import pandas as pd
+
 ##########################
 # OUTPUT
 ##########################
@@ -27,3 +35,205 @@ def to_json(df, file_name=None):
     df.to_json(path_or_buf=file_name, orient='index')
 
     return None
+
+
+##########################
+# COLUMNAR OUTPUT
+##########################
+
+#  projections can be written to Parquet or Arrow IPC (Feather) files in one of two layouts:
+#  'wide' keeps the dataframe's shape, with a numeric column per date
+#  'long' stores one (index, date, value) row per non-zero cell, eg. (cohort_date, date, DAU),
+#  which is much smaller for forward DAU projections since most of their cells are 0
+
+LAYOUTS = ['wide', 'long']
+FORMATS = {'parquet': '.parquet', 'feather': '.feather'}
+METADATA_KEY = b'theseus'
+
+
+def get_pyarrow():
+    # pyarrow is an optional dependency that's only needed for the columnar formats
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        import pyarrow.feather
+    except ImportError:
+        raise Exception('Parquet and Arrow output require the pyarrow package: pip install pyarrow')
+    return pyarrow
+
+
+def to_table(df, layout='wide'):
+    pa = get_pyarrow()
+
+    if layout not in LAYOUTS:
+        raise Exception("The layout must be either 'wide' or 'long'")
+
+    index_name = df.index.name if df.index.name is not None else 'index'
+    # the labels are kept in the metadata so that the dataframe can be rebuilt exactly,
+    # including any rows or dates that were all 0
+    metadata = {
+        'layout': layout,
+        'index_name': index_name,
+        'index': df.index.tolist(),
+        'columns': [str(c) for c in df.columns]
+    }
+    values = df.infer_objects()
+
+    if layout == 'wide':
+        table = pa.Table.from_pandas(values, preserve_index=True)
+    else:
+        values = values.to_numpy()
+        # dates are stored as integers when they all are
+        dates = np.asarray(df.columns)
+        try:
+            dates = dates.astype(np.int64)
+        except (TypeError, ValueError):
+            dates = dates.astype(str)
+        rows, columns = np.nonzero(values)
+        table = pa.table({
+            index_name: pa.array(np.asarray(df.index)[rows]),
+            'date': pa.array(dates[columns]),
+            'value': pa.array(values[rows, columns])
+        })
+
+    schema_metadata = dict(table.schema.metadata or {})
+    schema_metadata[METADATA_KEY] = json.dumps(metadata, default=str)
+    return table.replace_schema_metadata(schema_metadata)
+
+
+def from_table(table):
+    metadata = json.loads(table.schema.metadata[METADATA_KEY])
+    if metadata['layout'] == 'wide':
+        return table.to_pandas()
+
+    index = pd.Index(metadata['index'], name=metadata['index_name'])
+    columns = metadata['columns']
+    long_values = table.to_pandas()
+
+    # put every non-zero value back into its cell
+    rows = index.get_indexer(long_values[metadata['index_name']])
+    cells = pd.Index(columns).get_indexer(long_values['date'].astype(str))
+    values = np.zeros((len(index), len(columns)), dtype=long_values['value'].dtype)
+    values[rows, cells] = long_values['value'].to_numpy()
+
+    return pd.DataFrame(values, index=index, columns=columns)
+
+
+def get_file_name(file_name, file_format):
+    if not file_name:
+        file_name = 'theseus_output' + FORMATS[file_format]
+
+    if not file_name.endswith(FORMATS[file_format]):
+        file_name = file_name + FORMATS[file_format]
+
+    return file_name
+
+
+def write_table(table, file_name, file_format, compression):
+    pa = get_pyarrow()
+    if file_format == 'parquet':
+        pa.parquet.write_table(table, file_name, compression=compression)
+    else:
+        pa.feather.write_feather(table, file_name, compression=compression)
+
+
+def read_table(file_name, file_format):
+    pa = get_pyarrow()
+    if file_format == 'parquet':
+        # a part of a dataset is read on its own, without the segment column that pyarrow would
+        # otherwise add from the hive-style directory it's in
+        return pa.parquet.read_table(file_name, partitioning=None)
+    return pa.feather.read_table(file_name)
+
+
+def to_parquet(df, file_name=None, layout='wide', compression='zstd'):
+    file_name = get_file_name(file_name, 'parquet')
+    write_table(to_table(df, layout), file_name, 'parquet', compression)
+
+    return None
+
+
+def to_feather(df, file_name=None, layout='wide', compression='zstd'):
+    file_name = get_file_name(file_name, 'feather')
+    write_table(to_table(df, layout), file_name, 'feather', compression)
+
+    return None
+
+
+def read_parquet(file_name):
+    return from_table(read_table(get_file_name(file_name, 'parquet'), 'parquet'))
+
+
+def read_feather(file_name):
+    return from_table(read_table(get_file_name(file_name, 'feather'), 'feather'))
+
+
+##########################
+# DATASETS
+##########################
+
+#  a dataset is a directory of projections for many segments (or scenarios), laid out with
+#  hive-style partitioning (path/segment=<segment>/part-<n>.parquet) so that warehouses can read it
+#  directly. appending a projection writes a new file and never rewrites the existing ones
+
+
+def get_segment_path(path, segment):
+    return os.path.join(path, 'segment=' + quote(str(segment), safe=''))
+
+
+def append_to_dataset(df, path, segment, layout='long', file_format='parquet', compression='zstd'):
+    if file_format not in FORMATS:
+        raise Exception("The file format must be either 'parquet' or 'feather'")
+
+    segment_path = get_segment_path(path, segment)
+    os.makedirs(segment_path, exist_ok=True)
+
+    # parts are named so that they sort in the order they were written
+    file_name = os.path.join(
+        segment_path, 'part-' + str(time.time_ns()) + '-' + uuid.uuid4().hex + FORMATS[file_format]
+    )
+    write_table(to_table(df, layout), file_name, file_format, compression)
+
+    return None
+
+
+def read_dataset(path, segments=None, file_format='parquet'):
+    # # #  reads the projections for segments (or every segment) back from a dataset into one dataframe
+    # # #  indexed by segment and then the projection's own index. a segment that has had several
+    # # #  projections appended to it gets all of them, in the order they were written
+
+    if file_format not in FORMATS:
+        raise Exception("The file format must be either 'parquet' or 'feather'")
+    if not os.path.isdir(path):
+        raise Exception('No dataset found at ' + str(path))
+
+    if segments is None:
+        segment_paths = sorted(
+            (unquote(name[len('segment='):]), os.path.join(path, name))
+            for name in os.listdir(path) if name.startswith('segment=')
+        )
+    else:
+        segment_paths = [(str(segment), get_segment_path(path, segment)) for segment in segments]
+
+    projections = []
+    for segment, segment_path in segment_paths:
+        if not os.path.isdir(segment_path):
+            raise Exception('Segment ' + segment + ' not found in the dataset')
+        parts = sorted(name for name in os.listdir(segment_path) if name.endswith(FORMATS[file_format]))
+        for part in parts:
+            projection = from_table(read_table(os.path.join(segment_path, part), file_format))
+            projections.append(pd.concat({segment: projection}, names=['segment']))
+
+    if not projections:
+        return pd.DataFrame()
+
+    dataset = pd.concat(projections)
+    if dataset.isna().any(axis=None):
+        # projections over different dates leave gaps, which are days with no DAU
+        integers = all(
+            pd.api.types.is_integer_dtype(dtype) for projection in projections for dtype in projection.dtypes
+        )
+        dataset = dataset.fillna(0)
+        if integers:
+            dataset = dataset.astype(np.int64)
+    return dataset
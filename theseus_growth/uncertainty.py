@@ -0,0 +1,216 @@
+# # # #
+#  DAU Uncertainty Projections
+#  Monte Carlo projections of total DAU: parameter sets for the profile's curve are drawn from
+#  the covariance estimated when the curve was fitted, DAU is projected for every draw, and the
+#  quantiles of DAU on each date (eg. P10 / P50 / P90) are estimated as the draws stream through
+# # # #
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from theseus_growth import curve_functions
+from theseus_growth import instrumentation
+
+#  the most cells (draws x cohorts x dates) projected at once in a chunk of draws
+MAX_CHUNK_CELLS = 2 ** 24
+
+
+class StreamingQuantile():
+
+    # estimates quantile p of many streams of values at once (one stream per date) without storing
+    # the values, using the P-square algorithm (Jain & Chlamtac, 1985): five markers per stream track
+    # the minimum, the maximum, p and the quantiles halfway between them, and are adjusted with
+    # piecewise-parabolic interpolation as each value arrives
+
+    def __init__(self, p, size):
+        self.p = p
+        self.size = size
+        self.count = 0
+        self.initial = []
+        # the increments to the desired positions of the markers with every value
+        self.increments = np.array([0, p / 2, p, (1 + p) / 2, 1])
+
+    def update(self, values):
+        self.count += 1
+        if self.count <= 5:
+            # the first five values of each stream are the initial marker heights
+            self.initial.append(np.asarray(values, dtype=float))
+            if self.count == 5:
+                self.heights = np.sort(np.array(self.initial), axis=0)
+                self.positions = np.tile(np.arange(1.0, 6.0)[:, np.newaxis], (1, self.size))
+                self.desired = 1 + 4 * self.increments
+            return
+
+        values = np.asarray(values, dtype=float)
+        q = self.heights
+        n = self.positions
+
+        # the cell each value falls in, widening the extreme markers if it's a new minimum or maximum
+        cell = np.sum(values >= q[1:4], axis=0)
+        q[0] = np.minimum(q[0], values)
+        q[4] = np.maximum(q[4], values)
+
+        # every marker above the value's cell moves up a position
+        n += np.arange(5)[:, np.newaxis] > cell[np.newaxis, :]
+        self.desired = self.desired + self.increments
+
+        columns = np.arange(self.size)
+        with np.errstate(all='ignore'):
+            for i in [1, 2, 3]:
+                offset = self.desired[i] - n[i]
+                up = (offset >= 1) & (n[i + 1] - n[i] > 1)
+                down = (offset <= -1) & (n[i - 1] - n[i] < -1)
+                move = up | down
+                if not move.any():
+                    continue
+                step = np.where(up, 1.0, -1.0)
+
+                parabolic = q[i] + step / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + step) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - step) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                )
+                neighbor = i + step.astype(int)
+                linear = q[i] + step * (q[neighbor, columns] - q[i]) / (n[neighbor, columns] - n[i])
+                # the parabolic estimate is only used if it keeps the markers in order
+                adjusted = np.where((q[i - 1] < parabolic) & (parabolic < q[i + 1]), parabolic, linear)
+
+                q[i] = np.where(move, adjusted, q[i])
+                n[i] = np.where(move, n[i] + step, n[i])
+
+    def value(self):
+        if self.count == 0:
+            return np.full(self.size, np.nan)
+        if self.count < 5:
+            # not enough values for the markers yet, so the quantile is exact
+            return np.quantile(np.array(self.initial), self.p, axis=0)
+        if self.p == 0:
+            # the minimum and maximum are tracked exactly by the outer markers
+            return self.heights[0].copy()
+        if self.p == 1:
+            return self.heights[4].copy()
+        return self.heights[2].copy()
+
+
+def get_fitted_form(profile):
+    form = profile['retention_profile']
+    if form == 'best_fit':
+        form = profile['best_fit']
+
+    if form not in curve_functions.processes:
+        raise Exception('DAU uncertainty can only be projected for a fitted curve function, not ' + str(form))
+    if 'covariances' not in profile or form not in profile['covariances']:
+        raise Exception('The profile has no parameter covariance for the ' + form + ' function')
+
+    covariance = np.asarray(profile['covariances'][form], dtype=float)
+    if not np.all(np.isfinite(covariance)):
+        raise Exception('The covariance of the ' + form + ' function parameters could not be estimated')
+
+    return form, np.asarray(profile['params'][form], dtype=float), covariance
+
+
+def draw_retention(form, params, covariance, horizon, periods, draws, rng):
+    # a draws x periods array of retention vectors (by age, from day 0) for parameter sets drawn
+    # from the fitted params and their covariance. like the point projection, day 0 is 100,
+    # negative retention is 0, and any age past the horizon retains no one
+    drawn_params = rng.multivariate_normal(params, covariance, size=draws)
+
+    ages = np.arange(1, min(horizon, periods))[np.newaxis, :]
+    with np.errstate(all='ignore'):
+        curve = curve_functions.get_form(form).function(ages, *[drawn_params[:, [j]] for j in range(len(params))])
+    curve = np.broadcast_to(curve, (draws, ages.shape[1]))
+
+    retention = np.zeros((draws, periods))
+    retention[:, 0] = 100
+    retention[:, 1:ages.shape[1] + 1] = np.where(np.isfinite(curve) & (curve > 0), curve, 0)
+    return retention
+
+
+def simulate_DAU_totals(form, params, covariance, horizon, periods, cohorts, offset, seed, draws):
+    # # #  the total DAU on each date for a chunk of draws, as a draws x dates array
+    # # #  every draw is projected at once: draws x cohorts x ages, with each cohort mapped
+    # # #  onto the dates it's active on like build_cohort_matrix does for a single projection
+
+    rng = np.random.default_rng(seed)
+    retention = draw_retention(form, params, covariance, horizon, periods, draws, rng)
+
+    cohorts = np.asarray(cohorts, dtype=float)
+    projected = np.trunc(cohorts[np.newaxis, :, np.newaxis] * retention[:, np.newaxis, :] / 100)
+
+    ages = np.arange(periods + offset)[np.newaxis, :] - np.arange(len(cohorts))[:, np.newaxis] - offset
+    DAU = np.take_along_axis(projected, np.clip(ages, 0, periods - 1)[np.newaxis, :, :], axis=2)
+    DAU[:, ages < 0] = 0
+
+    return DAU.sum(axis=1)
+
+
+@instrumentation.timed('project_DAU_quantiles')
+def project_DAU_quantiles(profile, periods, cohorts, draws=1000, quantiles=(0.1, 0.5, 0.9), start_date=1,
+                          seed=None, max_workers=1, chunk_size=None):
+    # # #  Monte Carlo quantiles of the total DAU projected for cohorts, from draws of the parameters
+    # # #  of the profile's curve function. the draws are projected in chunks of chunk_size, spread
+    # # #  over max_workers processes, and the quantiles are estimated as the chunks come in so that
+    # # #  memory doesn't grow with the number of draws.
+    # # #  returns a dict of quantile -> dataframe shaped like the output of DAU_total
+
+    if not isinstance(periods, int) or periods < 2:
+        raise Exception("The periods parameter must be an integer greater than 1")
+
+    if len(cohorts) < 1 or not all(isinstance(x, int) for x in cohorts) or not all(x >= 1 for x in cohorts):
+        raise Exception("Must provide at least one cohort value, and all cohort values must be greater than 0")
+
+    if not isinstance(draws, int) or draws < 1:
+        raise Exception("The number of draws must be an integer greater than 0")
+
+    if not all(0 <= q <= 1 for q in quantiles):
+        raise Exception("Quantiles must be between 0 and 1")
+
+    if start_date == 0 or start_date is None:
+        start_date = 1
+
+    # the dates match those of project_cohorted_DAU
+    offset = 0 if start_date == 1 else 1
+    dates = [str(x) for x in range(start_date, start_date + periods + offset)]
+
+    form, params, covariance = get_fitted_form(profile)
+    horizon = len(profile['retention_projection'][1])
+
+    if chunk_size is None:
+        chunk_size = max(1, MAX_CHUNK_CELLS // (len(cohorts) * len(dates)))
+    chunk_draws = [min(chunk_size, draws - first) for first in range(0, draws, chunk_size)]
+    # every chunk gets its own random stream, so the results don't depend on the number of workers
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_draws))
+    chunks = [
+        (form, params, covariance, horizon, periods, cohorts, offset, chunk_seed, this_draws)
+        for chunk_seed, this_draws in zip(seeds, chunk_draws)
+    ]
+
+    estimates = [StreamingQuantile(q, len(dates)) for q in quantiles]
+
+    def update(DAU_totals):
+        for DAU in DAU_totals:
+            for estimate in estimates:
+                estimate.update(DAU)
+
+    if max_workers == 1:
+        for chunk in chunks:
+            update(simulate_DAU_totals(*chunk))
+    else:
+        workers = max_workers if max_workers is not None else os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # only a couple of chunks per worker are in flight at once, so finished chunks don't pile up
+            in_flight = deque()
+            for chunk in chunks:
+                in_flight.append(executor.submit(simulate_DAU_totals, *chunk))
+                if len(in_flight) >= 2 * workers:
+                    update(in_flight.popleft().result())
+            while in_flight:
+                update(in_flight.popleft().result())
+
+    DAU_quantiles = {}
+    for q, estimate in zip(quantiles, estimates):
+        DAU_total = pd.DataFrame([estimate.value()], index=pd.Index(['DAU'], name='Value'), columns=dates)
+        DAU_quantiles[q] = DAU_total
+
+    return DAU_quantiles